@@ -0,0 +1,76 @@
+"""Caption-build time with ImageMagick TextClip versus the in-process Pillow rasterizer.
+
+Usage: python -m benchmarks.caption_build_benchmark path/to/font.ttf [words]
+
+Builds the per-word sprites both caption endpoints need for a synthetic
+script: v1 makes a white and a black-stroke layer per word (plus the five
+glow clips the old code built and threw away), v2 makes one measuring and
+one placed clip per word.
+"""
+import random
+import sys
+import time
+
+from moviepy.editor import ImageClip, TextClip
+
+from utils.text_rendering import render_text, sprite_cache
+
+VOCABULARY = ("the you and to a of it is that in this we your for on with but what so "
+              "just like know really about people money never every because think").split()
+
+
+def text_clip(text: str, font_path: str, fontsize: int, color='white', stroke_color=None, stroke_width: float = 0, kerning: float = 0) -> ImageClip:
+    # Drop-in replacement for TextClip(...), sprites come from the shared cache
+    return ImageClip(sprite_cache.render(text, font_path, fontsize, color, stroke_color, stroke_width, kerning))
+
+
+def script(words: int):
+    rng = random.Random(0)
+    return [rng.choice(VOCABULARY) + ("." if rng.random() < 0.1 else "") for _ in range(words)]
+
+
+def v1_textclip(words, font_path):
+    for txt in words:
+        TextClip(txt, fontsize=100, font=font_path, color='white', stroke_color='white', stroke_width=4, kerning=8)
+        TextClip(txt, fontsize=106, font=font_path, color='transparent', stroke_color='black', stroke_width=6, kerning=8)
+        for _ in range(5):
+            TextClip(txt, fontsize=108, font=font_path, color='transparent', stroke_color='rgb(206, 202, 198)', stroke_width=6, kerning=6)
+
+
+def v1_pillow(words, font_path):
+    for txt in words:
+        text_clip(txt, font_path, 100, color='white', stroke_color='white', stroke_width=4, kerning=8)
+        text_clip(txt, font_path, 106, color='transparent', stroke_color='black', stroke_width=6, kerning=8)
+
+
+def v2_textclip(words, font_path):
+    for txt in words:
+        TextClip(txt, font=font_path, fontsize=70, color='white', stroke_color='black', stroke_width=4).size
+        TextClip(txt, font=font_path, fontsize=70, color='white', stroke_color='black', stroke_width=4)
+
+
+def v2_pillow(words, font_path):
+    for txt in words:
+        render_text(txt, font_path, 70, color='white', stroke_color='black', stroke_width=4).shape
+        text_clip(txt, font_path, 70, color='white', stroke_color='black', stroke_width=4)
+
+
+def timed(fn, words, font_path):
+    start = time.time()
+    fn(words, font_path)
+    return time.time() - start
+
+
+def main():
+    font_path = sys.argv[1]
+    words = script(int(sys.argv[2]) if len(sys.argv) > 2 else 150)
+
+    print(f"{len(words)} caption words")
+    for name, before, after in (("v1", v1_textclip, v1_pillow), ("v2", v2_textclip, v2_pillow)):
+        before_seconds = timed(before, words, font_path)
+        after_seconds = timed(after, words, font_path)
+        print(f"{name}: TextClip {before_seconds:7.2f}s  Pillow {after_seconds:7.2f}s  ({before_seconds / after_seconds:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Per-frame caption compositing cost, one clip per word versus the indexed caption overlay.
+
+Usage: python -m benchmarks.caption_overlay_benchmark [frames]
+
+Builds 50, 500 and 5000-word caption tracks (about three words a second,
+three words on screen at a time) of synthetic word sprites over a
+1080x1920 background. Renders the same frames through
+CompositeVideoClip([background] + word clips) and through
+CaptionOverlay.apply, and checks that both give the same pixels.
+"""
+import sys
+import time
+
+import numpy as np
+from moviepy.editor import ColorClip, CompositeVideoClip, ImageClip
+
+from utils.caption_overlay import CaptionOverlay
+
+SIZE = (1080, 1920)
+WORDS_PER_SECOND = 3
+WORD_COUNTS = (50, 500, 5000)
+
+
+def word_sprite(rng):
+    sprite = np.zeros((90, rng.integers(80, 400), 4), dtype=np.uint8)
+    sprite[..., :3] = 255
+    sprite[10:80, 5:-5, 3] = 255
+    return sprite
+
+
+def caption_track(words: int):
+    rng = np.random.default_rng(0)
+    track = []
+    for i in range(words):
+        start = i / WORDS_PER_SECOND
+        end = (i - i % 3 + 3) / WORDS_PER_SECOND  # every line of three is cleared together
+        track.append((word_sprite(rng), start, end, 100 + 300 * (i % 3), SIZE[1] * 3 // 4))
+    return track
+
+
+def frame_seconds(clip, times):
+    start = time.time()
+    frames = [clip.get_frame(t) for t in times]
+    return (time.time() - start) / len(times), frames
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 48
+
+    print(f"{'words':>6} {'clips/frame':>14} {'overlay/frame':>14} {'speedup':>8}")
+    for words in WORD_COUNTS:
+        track = caption_track(words)
+        duration = words / WORDS_PER_SECOND
+        background = ColorClip(SIZE, color=(40, 60, 80)).set_duration(duration)
+        times = np.linspace(0, duration, frames, endpoint=False)
+
+        word_clips = [ImageClip(sprite).set_start(start).set_duration(end - start).set_position((x, y))
+                      for sprite, start, end, x, y in track]
+        composite = CompositeVideoClip([background] + word_clips, size=SIZE)
+
+        overlay = CaptionOverlay(SIZE)
+        for sprite, start, end, x, y in track:
+            overlay.add(sprite, start, end, x, y)
+        overlaid = overlay.apply(background)
+
+        composite_seconds, composite_frames = frame_seconds(composite, times)
+        overlay_seconds, overlay_frames = frame_seconds(overlaid, times)
+        difference = max(np.abs(a.astype(np.int16) - b.astype(np.int16)).max() for a, b in zip(composite_frames, overlay_frames))
+        print(f"{words:>6} {composite_seconds * 1000:11.1f} ms {overlay_seconds * 1000:11.1f} ms "
+              f"{composite_seconds / overlay_seconds:7.1f}x  (max pixel difference {difference})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare serial and chunked-parallel transcription of a long local audio file.
+
+Usage: python -m benchmarks.long_audio_benchmark path/to/voice_over.mp3 [model] [chunk_seconds]
+
+Reports wall-clock time for both paths and the drift between word start
+times of words that appear in both transcripts.
+"""
+import asyncio
+import difflib
+import sys
+import time
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE, load_audio
+from utils.long_audio import CHUNK_SECONDS, transcribe_long_audio
+from utils.transcription_executor import POOL_SIZE, get_executor, shutdown_executor
+from utils.whisper_models import DEFAULT_MODEL, get_model
+
+
+def words_of(result):
+    return [word for segment in result['segments'] for word in segment['words']]
+
+
+def word_timing_drift(serial_words, chunked_words):
+    normalize = lambda words: [w['word'].strip().lower().strip('.,?!') for w in words]
+    matcher = difflib.SequenceMatcher(None, normalize(serial_words), normalize(chunked_words), autojunk=False)
+    drift = [
+        abs(serial_words[block.a + k]['start'] - chunked_words[block.b + k]['start'])
+        for block in matcher.get_matching_blocks()
+        for k in range(block.size)
+    ]
+    return matcher.ratio(), np.array(drift)
+
+
+async def run_chunked(pcm, model_name, chunk_seconds):
+    # Warm the pool first so worker startup is not counted
+    await asyncio.gather(*[
+        asyncio.get_running_loop().run_in_executor(get_executor(), time.sleep, 0.1)
+        for _ in range(POOL_SIZE)
+    ])
+    start = time.time()
+    result = await transcribe_long_audio(pcm, model_name, word_timestamps=True, chunk_seconds=chunk_seconds)
+    return result, time.time() - start
+
+
+def main():
+    audio_path = sys.argv[1]
+    model_name = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL
+    chunk_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else CHUNK_SECONDS
+
+    pcm = load_audio(audio_path)
+    print(f"Audio duration: {len(pcm) / SAMPLE_RATE:.1f} seconds, model {model_name}, {POOL_SIZE} workers")
+
+    model = get_model(model_name)
+    start = time.time()
+    serial = model.transcribe(pcm, word_timestamps=True, fp16=False)
+    serial_time = time.time() - start
+    print(f"Serial:  {serial_time:.2f} s")
+
+    try:
+        chunked, chunked_time = asyncio.run(run_chunked(pcm, model_name, chunk_seconds))
+    finally:
+        shutdown_executor()
+    print(f"Chunked: {chunked_time:.2f} s over {chunked['chunks']} chunks ({serial_time / chunked_time:.2f}x)")
+
+    similarity, drift = word_timing_drift(words_of(serial), words_of(chunked))
+    print(f"Word sequence similarity: {similarity:.3f}")
+    if len(drift):
+        print(f"Word start drift over {len(drift)} matched words: "
+              f"mean {drift.mean() * 1000:.0f} ms, p95 {np.percentile(drift, 95) * 1000:.0f} ms, max {drift.max() * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare fp32 and int8-quantized Whisper inference on a local audio set.
+
+Usage: python -m benchmarks.quantization_benchmark path/to/audio_dir [model ...]
+
+Every audio file in the directory is transcribed by each model in fp32 and
+int8. A reference transcript next to the audio (same name, .txt extension)
+is used for word error rate; without one the fp32 output of the same model
+is the reference. Reports real-time factor (decode time / audio
+duration, lower is better) and WER per model.
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE, load_audio
+from utils.transcription_executor import TORCH_THREADS
+from utils.whisper_models import DEFAULT_MODEL, get_model, model_spec
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg')
+
+
+def normalize(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Levenshtein distance over words, one DP row at a time
+    previous = np.arange(len(hyp) + 1)
+    for i, ref_word in enumerate(ref, start=1):
+        current = np.empty_like(previous)
+        current[0] = i
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def transcribe_all(model_name: str, audio_set: list) -> tuple:
+    model = get_model(model_name)
+    texts, decode_time = [], 0.0
+    for _, pcm in audio_set:
+        start = time.time()
+        texts.append(model.transcribe(pcm, fp16=False)['text'])
+        decode_time += time.time() - start
+    return texts, decode_time
+
+
+def main():
+    import torch
+
+    audio_dir = sys.argv[1]
+    models = sys.argv[2:] or [DEFAULT_MODEL]
+    if TORCH_THREADS:
+        torch.set_num_threads(TORCH_THREADS)
+
+    audio_set = [
+        (os.path.join(audio_dir, name), load_audio(os.path.join(audio_dir, name)))
+        for name in sorted(os.listdir(audio_dir))
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    ]
+    total_duration = sum(len(pcm) for _, pcm in audio_set) / SAMPLE_RATE
+    print(f"{len(audio_set)} files, {total_duration:.1f} seconds of audio, {torch.get_num_threads()} torch threads")
+
+    references = []
+    for path, _ in audio_set:
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        references.append(open(reference_path).read() if os.path.exists(reference_path) else None)
+
+    print(f"{'model':<16} {'RTF':>8} {'WER':>8}")
+    for name in models:
+        fp32_texts = None
+        for quantized in (False, True):
+            spec = model_spec(name, quantized)
+            # Warm up so model loading and first-call overhead are not counted
+            get_model(spec).transcribe(audio_set[0][1][:SAMPLE_RATE], fp16=False)
+            texts, decode_time = transcribe_all(spec, audio_set)
+            if fp32_texts is None:
+                fp32_texts = texts
+            wer = np.mean([
+                word_error_rate(reference if reference is not None else fp32_text, text)
+                for reference, fp32_text, text in zip(references, fp32_texts, texts)
+            ])
+            print(f"{spec:<16} {decode_time / total_duration:>8.3f} {wer:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Render time and CPU-seconds of the moviepy and ffmpeg background render backends.
+
+Usage: python -m benchmarks.render_backend_benchmark [audio_seconds] [clip_count]
+
+Generates a local test timeline with ffmpeg (pre-scaled 1080p-high clips of
+mixed widths, a voice-over tone and a shorter music bed) and renders it with
+both backends. CPU-seconds include the ffmpeg child processes.
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from utils.background_render import RENDER_BACKENDS
+from utils.ffmpeg import INTERMEDIATE_ARGS, probe_video, run_ffmpeg
+
+CLIP_WIDTHS = [1920, 1440, 1080]
+
+
+def make_inputs(directory: str, audio_seconds: float, clip_count: int):
+    video_paths = []
+    for i in range(clip_count):
+        width = CLIP_WIDTHS[i % len(CLIP_WIDTHS)]
+        path = os.path.join(directory, f"clip_{i}.mp4")
+        run_ffmpeg(["-f", "lavfi", "-i", f"testsrc2=size={width}x1080:rate=30:duration=5"] + INTERMEDIATE_ARGS + [path])
+        video_paths.append(path)
+
+    audio_path = os.path.join(directory, "voice.mp3")
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=220:duration={audio_seconds}", audio_path])
+    music_path = os.path.join(directory, "music.mp3")
+    run_ffmpeg(["-f", "lavfi", "-i", f"sine=frequency=440:duration={audio_seconds / 3:.1f}", music_path])
+    return video_paths, audio_path, music_path
+
+
+def cpu_seconds() -> float:
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def main():
+    audio_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30.0
+    clip_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with tempfile.TemporaryDirectory() as directory:
+        video_paths, audio_path, music_path = make_inputs(directory, audio_seconds, clip_count)
+        print(f"Timeline: {clip_count} clips looped over {audio_seconds:.0f} seconds of audio")
+
+        results = {}
+        for backend, render in RENDER_BACKENDS.items():
+            output_path = os.path.join(directory, f"{backend}.mp4")
+            cpu_start, start = cpu_seconds(), time.time()
+            render(video_paths, audio_path, music_path, output_path)
+            results[backend] = (time.time() - start, cpu_seconds() - cpu_start, probe_video(output_path))
+
+        print(f"{'backend':<10} {'wall':>8} {'cpu':>8}  output")
+        for backend, (wall, cpu, output) in results.items():
+            print(f"{backend:<10} {wall:7.2f}s {cpu:7.2f}s  {output['width']}x{output['height']} "
+                  f"@ {output['fps']:.2f} fps, {output['duration']:.2f}s")
+        moviepy_wall = results["moviepy"][0]
+        print(f"ffmpeg speedup: {moviepy_wall / results['ffmpeg'][0]:.1f}x wall, "
+              f"{results['moviepy'][1] / results['ffmpeg'][1]:.1f}x cpu")
+
+
+if __name__ == "__main__":
+    main()
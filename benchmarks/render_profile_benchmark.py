@@ -0,0 +1,54 @@
+"""Encode speed and output size of every render profile on a fixed local timeline.
+
+Usage: python -m benchmarks.render_profile_benchmark [seconds] [profile ...]
+
+The timeline is synthetic and deterministic: a 1080x1920 moving gradient
+with a sine tone, so results are comparable between machines and runs.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from moviepy.editor import AudioClip, VideoClip
+
+from utils.render_profiles import PROFILES, write_videofile_args
+
+WIDTH, HEIGHT = 1080, 1920
+SOURCE_FPS = 30
+
+
+def test_timeline(seconds: float):
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+
+    def make_frame(t):
+        shift = int(t * 120)
+        rgb = np.stack([(x + shift) & 0xFF, (y - shift) & 0xFF, ((x ^ y) + shift) & 0xFF], axis=-1)
+        return rgb.astype(np.uint8)
+
+    audio = AudioClip(lambda t: 0.2 * np.sin(2 * np.pi * 220 * np.asarray(t)), duration=seconds, fps=44100)
+    return VideoClip(make_frame, duration=seconds).set_fps(SOURCE_FPS).set_audio(audio)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    names = sys.argv[2:] or list(PROFILES)
+    clip = test_timeline(seconds)
+
+    print(f"Timeline: {WIDTH}x{HEIGHT}, {seconds:.0f} seconds at {SOURCE_FPS} fps")
+    print(f"{'profile':<10} {'encode':>8} {'fps':>7} {'x realtime':>10} {'size':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            output_path = os.path.join(directory, f"{name}.mp4")
+            args = write_videofile_args(name, fps=SOURCE_FPS)
+            start = time.time()
+            clip.write_videofile(output_path, logger=None, **args)
+            elapsed = time.time() - start
+            frames = seconds * args["fps"]
+            size_mb = os.path.getsize(output_path) / (1024 * 1024)
+            print(f"{name:<10} {elapsed:7.2f}s {frames / elapsed:7.1f} {seconds / elapsed:9.2f}x {size_mb:7.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Frames-per-second of the Ken Burns zoom effect, old PIL double resize vs single resample.
+
+Usage: python -m benchmarks.zoom_benchmark [image_path] [seconds]
+
+Without an image a synthetic 1080x1350 still is used. Also reports the mean
+absolute pixel difference between both effects to show they match.
+"""
+import math
+import sys
+import time
+
+import numpy as np
+from moviepy.editor import ImageClip
+from PIL import Image
+
+from endpoints.create_background_video_v2 import zoom_in_effect
+
+FPS = 24
+
+
+def legacy_zoom_in_effect(clip, zoom_ratio=0.04):
+    # The per-frame upscale, crop and downscale effect this benchmark replaces
+    def effect(get_frame, t):
+        img = Image.fromarray(get_frame(t))
+        base_size = img.size
+
+        new_size = [
+            math.ceil(img.size[0] * (1 + (zoom_ratio * t))),
+            math.ceil(img.size[1] * (1 + (zoom_ratio * t)))
+        ]
+        new_size[0] = new_size[0] + (new_size[0] % 2)
+        new_size[1] = new_size[1] + (new_size[1] % 2)
+
+        img = img.resize(new_size, Image.LANCZOS)
+
+        x = math.ceil((new_size[0] - base_size[0]) / 2)
+        y = math.ceil((new_size[1] - base_size[1]) / 2)
+
+        img = img.crop([
+            x, y, new_size[0] - x, new_size[1] - y
+        ]).resize(base_size, Image.LANCZOS)
+
+        result = np.array(img)
+        img.close()
+
+        return result
+
+    return clip.fl(effect)
+
+
+def synthetic_image(width=1080, height=1350):
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack([(x * 255 // width), (y * 255 // height), ((x ^ y) & 0xFF)], axis=-1)
+    return rgb.astype(np.uint8)
+
+
+def render(clip, times):
+    start = time.time()
+    frames = [clip.get_frame(t) for t in times]
+    return frames, len(times) / (time.time() - start)
+
+
+def main():
+    image = np.array(Image.open(sys.argv[1]).convert("RGB")) if len(sys.argv) > 1 else synthetic_image()
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    times = np.arange(0, seconds, 1 / FPS)
+
+    base = ImageClip(image).set_duration(seconds).resize(width=1080)
+    legacy_frames, legacy_fps = render(base.fx(legacy_zoom_in_effect, zoom_ratio=0.04), times)
+    frames, fps = render(base.fx(zoom_in_effect, zoom_ratio=0.04), times)
+
+    difference = np.mean([np.abs(a.astype(np.int16) - b.astype(np.int16)).mean() for a, b in zip(legacy_frames, frames)])
+    print(f"Frame size {base.size[0]}x{base.size[1]}, {len(times)} frames")
+    print(f"Legacy zoom: {legacy_fps:7.1f} fps")
+    print(f"Single-resample zoom: {fps:7.1f} fps ({fps / legacy_fps:.1f}x)")
+    print(f"Mean absolute pixel difference: {difference:.2f} / 255")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,44 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import uuid
 import os
 from concurrent.futures import ThreadPoolExecutor
 from fastapi.responses import JSONResponse
+from utils.render_profiles import DEFAULT_PROFILE, resolve_profile, sets_rate_control
 import os
 import uuid
-import requests
-from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, TextClip, CompositeVideoClip, concatenate_audioclips, ColorClip
+from utils.download_manager import JOB_MAX_IN_FLIGHT_MB, MAX_PARALLEL_DOWNLOADS, ByteBudget, download_manager
+from utils.asset_cache import asset_cache
+from utils.background_render import RENDER_BACKEND, RENDER_BACKENDS, STREAM_COPY_ENABLED, is_stream_copy_ready, render_background
+from utils.ffmpeg import prescale_video
+from utils.pipeline import PipelineStats, Stage, run_pipeline
+import time
 
 
 router = APIRouter()
 executor = ThreadPoolExecutor(max_workers=4)
 output_dir = "BackgroundVideos"
+PREPARE_WORKERS = int(os.getenv("BACKGROUND_PREPARE_WORKERS", "2"))
 
 class VideoCreateRequest(BaseModel):
     audio_url: str
     assetUrls: List[str]
     background_music_url: str
+    render_backend: Optional[str] = None  # "moviepy" or "ffmpeg", defaults to BACKGROUND_RENDER_BACKEND
+    render_profile: Optional[str] = None  # Named encoder profile, defaults to RENDER_PROFILE_BACKGROUND_V1 or RENDER_PROFILE
 
 @router.post("/create-background-video/v1")
 async def create_video_background_video_v1_endpoint(request: VideoCreateRequest):
+    try:
+        render_profile = resolve_profile(request.render_profile, "background_v1")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    render_backend = request.render_backend or RENDER_BACKEND
+    if render_backend not in RENDER_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown render backend '{render_backend}', expected one of {sorted(RENDER_BACKENDS)}")
+    # A profile the request picks for its quality or bitrate settings needs a real encode
+    stream_copy = STREAM_COPY_ENABLED and not (request.render_profile and sets_rate_control(render_profile))
     try:
         audio_url = request.audio_url
         asset_urls = [strip_url_params(url) for url in request.assetUrls]
@@ -30,7 +47,7 @@ async def create_video_background_video_v1_endpoint(request: VideoCreateRequest)
         unique_filename = f"{uuid.uuid4()}.mp4"
         output_video_path = os.path.join(output_dir, unique_filename)
         
-        executor.submit(create_video_background_video_v1, audio_url, asset_urls, background_music_url, output_video_path)
+        executor.submit(create_video_background_video_v1, audio_url, asset_urls, background_music_url, output_video_path, render_backend, render_profile, stream_copy)
         
         return JSONResponse(content={"message": "Video processing started", "video_path": f"BackgroundVideos/{unique_filename}"})
     except Exception as e:
@@ -39,82 +56,65 @@ def strip_url_params(url: str) -> str:
     # Split the URL at the '?' and return only the base URL
     return url.split('?')[0]
 
-def create_video_background_video_v1(audio_url: str, asset_urls: List[str], background_music_url: str, output_video_path: str):
+def create_video_background_video_v1(audio_url: str, asset_urls: List[str], background_music_url: str, output_video_path: str, render_backend: str = None, render_profile: str = DEFAULT_PROFILE, stream_copy: bool = STREAM_COPY_ENABLED):
+    cached_paths = []
     try:
-        # Download main audio file
-        print("Downloading main audio...")
-        audio_response = requests.get(audio_url)
+        target_size = (1920, 1080)  # Example target size (width, height)
+        stats = PipelineStats()
+
+        # The voice-over is unique to the job, music and assets go through the shared asset cache.
+        # Voice-over and music download in the background while the assets go through the pipeline.
+        print(f"Downloading main audio, background music and {len(asset_urls)} assets...")
         audio_path = os.path.join(output_dir, f"audio_{uuid.uuid4()}.mp3")
-        with open(audio_path, 'wb') as f:
-            f.write(audio_response.content)
-        
-        # Get the length of the main audio file
-        print("Loading main audio file...")
-        audio_clip = AudioFileClip(audio_path)
-        audio_duration = audio_clip.duration
-        print(f"Main audio duration: {audio_duration} seconds")
-
-        # Download background music
-        print("Downloading background music...")
-        bg_music_response = requests.get(background_music_url)
-        bg_music_path = os.path.join(output_dir, f"background_music_{uuid.uuid4()}.mp3")
-        with open(bg_music_path, 'wb') as f:
-            f.write(bg_music_response.content)
-        
-        # Load background music and set volume to 20%
-        bg_music_clip = AudioFileClip(bg_music_path).volumex(0.14)
+        temp_files = [audio_path]  # To keep track of intermediate files for deletion
+        audio_download = download_manager.submit(audio_url, audio_path)
+        music_fetch = download_manager.executor.submit(asset_cache.fetch, background_music_url, ".mp3")
 
-        # Manually loop the background music to match the duration of the main audio
-        bg_music_clips = []
-        total_bg_duration = 0
-        while total_bg_duration < audio_duration:
-            bg_music_clips.append(bg_music_clip)
-            total_bg_duration += bg_music_clip.duration
+        budget = ByteBudget(int(JOB_MAX_IN_FLIGHT_MB * 1024 * 1024))
 
-        combined_bg_music_clip = concatenate_audioclips(bg_music_clips).subclip(0, audio_duration)
-        
-        # Combine the main audio and background music
-        combined_audio = CompositeAudioClip([audio_clip, combined_bg_music_clip])
-        
-        # Download and process asset videos
-        video_clips = []
-        target_size = (1920, 1080)  # Example target size (width, height)
-        temp_files = [audio_path, bg_music_path]  # To keep track of intermediate files for deletion
-
-        for i, url in enumerate(asset_urls):
-            print(f"Downloading video {i+1}/{len(asset_urls)}...")
-            video_response = requests.get(url)
-            video_path = os.path.join(output_dir, f"asset_{uuid.uuid4()}.mp4")
-            temp_files.append(video_path)
-            with open(video_path, 'wb') as f:
-                f.write(video_response.content)
-            
-            video_clip = VideoFileClip(video_path).subclip(0, min(5, VideoFileClip(video_path).duration))
-            
-            # Resize the video to have the same dimensions, maintaining aspect ratio
-            video_clip = video_clip.resize(height=target_size[1]).set_position("center")
-            video_clips.append(video_clip)
-            print(f"Video {i+1} duration: {video_clip.duration} seconds")
-        
-        # Concatenate video clips to match audio length
-        final_clips = []
-        total_duration = 0
-        clip_index = 0
-        print("Concatenating video clips to match audio duration...")
-        while total_duration < audio_duration:
-            clip = video_clips[clip_index].subclip(0, min(5, video_clips[clip_index].duration))
-            if total_duration + clip.duration > audio_duration:
-                clip = clip.subclip(0, audio_duration - total_duration)
-            final_clips.append(clip)
-            total_duration += clip.duration
-            clip_index = (clip_index + 1) % len(video_clips)
-            print(f"Total video duration: {total_duration} seconds")
-        
-        final_video = concatenate_videoclips(final_clips, method="compose")
-        final_video = final_video.set_audio(combined_audio)
-        
-        print(f"Writing final video to {output_video_path}...")
-        final_video.write_videofile(output_video_path, codec="libx264", audio_codec="aac")
+        def download_asset(url):
+            # Only the first 5 seconds of each asset are used, so only those are fetched when the server allows it
+            path = asset_cache.fetch(url, ".mp4", budget, 5)
+            cached_paths.append(path)
+            return path
+
+        def prescale_asset(video_path):
+            # Trim to 5 seconds and scale to the target height once
+            prescaled_path = os.path.join(output_dir, f"prescaled_{uuid.uuid4()}.mp4")
+            temp_files.append(prescaled_path)
+            return prescale_video(video_path, prescaled_path, max_seconds=5, height=target_size[1])
+
+        def prepare_asset(video_path):
+            # Sources that are already H.264 at the target height are held back as they are, in
+            # case the whole timeline can be stream copied; the rest are prescaled while later
+            # assets are still downloading
+            if stream_copy and is_stream_copy_ready(video_path, target_size[1]):
+                return video_path
+            return prescale_asset(video_path)
+
+        def prepare_fallback(paths):
+            # Stream copy was ruled out for the timeline, so the held back sources (still the
+            # cached originals) are prescaled after all
+            def prescale_held_back(path):
+                return prescale_asset(path) if path in cached_paths else path
+            return run_pipeline(paths, [Stage("prescale", prescale_held_back, workers=PREPARE_WORKERS)], stats)
+
+        video_paths = run_pipeline(asset_urls, [
+            Stage("download", download_asset, workers=MAX_PARALLEL_DOWNLOADS, executor=download_manager.executor),
+            Stage("prepare", prepare_asset, workers=PREPARE_WORKERS)
+        ], stats)
+
+        bg_music_path = music_fetch.result()
+        cached_paths.append(bg_music_path)
+        audio_download.result()
+
+        # render_profile was resolved and validated by the endpoint
+        encode_start = time.time()
+        render_background(video_paths, audio_path, bg_music_path, output_video_path, render_backend, render_profile,
+                          prepare_fallback, set(cached_paths) if stream_copy else None)
+        stats.add("encode", 1, time.time() - encode_start, 1)
+        stats.print_report()
+        budget.print_report()
         
         # Clean up intermediate files
         print("Cleaning up temporary files...")
@@ -129,3 +129,9 @@ def create_video_background_video_v1(audio_url: str, asset_urls: List[str], back
     
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        asset_cache.release(cached_paths)
+
+@router.get("/create-background-video/asset-cache-stats")
+async def asset_cache_stats():
+    return asset_cache.stats()
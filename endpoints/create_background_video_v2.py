@@ -1,27 +1,39 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import uuid
 import os
 from concurrent.futures import ThreadPoolExecutor
 from fastapi.responses import JSONResponse
-import requests
+from utils.render_profiles import DEFAULT_PROFILE, resolve_profile, write_videofile_args
+from utils.download_manager import JOB_MAX_IN_FLIGHT_MB, MAX_PARALLEL_DOWNLOADS, ByteBudget, download_manager
+from utils.asset_cache import asset_cache
+from utils.ffmpeg import prescale_video
+from utils.image_cache import image_cache
+from utils.pipeline import PipelineStats, Stage, run_pipeline
 from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, ImageClip, concatenate_audioclips
 from PIL import Image
 import math
+import time
 import numpy as np
 
 router = APIRouter()
 executor = ThreadPoolExecutor(max_workers=4)
 output_dir_for_semantic_videos_backgrounds = "SemanticVideosBackgrounds"
+PREPARE_WORKERS = int(os.getenv("BACKGROUND_PREPARE_WORKERS", "2"))
 
 class VideoCreateRequestFromSemanticImages(BaseModel):
     audio_url: str
     semantic_structure: List[dict]
     background_music_url: str
+    render_profile: Optional[str] = None  # Named encoder profile, defaults to RENDER_PROFILE_BACKGROUND_V2 or RENDER_PROFILE
 
 @router.post("/create-background-video/v2")
 async def create_video_background_video_v2_endpoint(request: VideoCreateRequestFromSemanticImages):
+    try:
+        render_profile = resolve_profile(request.render_profile, "background_v2")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         print("Received POST data:", request)
 
@@ -37,7 +49,7 @@ async def create_video_background_video_v2_endpoint(request: VideoCreateRequestF
         print(response)
 
         # Submit the video creation task to the executor
-        executor.submit(create_video_background_video_v2, request.audio_url, request.semantic_structure, request.background_music_url, output_video_path)
+        executor.submit(create_video_background_video_v2, request.audio_url, request.semantic_structure, request.background_music_url, output_video_path, render_profile)
         
         return JSONResponse(content=response)
 
@@ -46,33 +58,34 @@ async def create_video_background_video_v2_endpoint(request: VideoCreateRequestF
         raise HTTPException(status_code=500, detail=str(e))
     
 
-def zoom_in_effect(clip, zoom_ratio=0.04):
-    def effect(get_frame, t):
-        img = Image.fromarray(get_frame(t))
-        base_size = img.size
-
-        new_size = [
-            math.ceil(img.size[0] * (1 + (zoom_ratio * t))),
-            math.ceil(img.size[1] * (1 + (zoom_ratio * t)))
-        ]
+def zoom_box(t, base_size, source_size, zoom_ratio=0.04):
+    # Crop rectangle, in source pixels, of a frame upscaled by (1 + zoom_ratio * t),
+    # rounded to even dimensions and center-cropped back to base_size
+    new_size = [
+        math.ceil(base_size[0] * (1 + (zoom_ratio * t))),
+        math.ceil(base_size[1] * (1 + (zoom_ratio * t)))
+    ]
+    new_size[0] = new_size[0] + (new_size[0] % 2)
+    new_size[1] = new_size[1] + (new_size[1] % 2)
 
-        # The new dimensions must be even.
-        new_size[0] = new_size[0] + (new_size[0] % 2)
-        new_size[1] = new_size[1] + (new_size[1] % 2)
+    x = math.ceil((new_size[0] - base_size[0]) / 2)
+    y = math.ceil((new_size[1] - base_size[1]) / 2)
 
-        img = img.resize(new_size, Image.LANCZOS)
+    scale_x = source_size[0] / new_size[0]
+    scale_y = source_size[1] / new_size[1]
+    return (x * scale_x, y * scale_y, (new_size[0] - x) * scale_x, (new_size[1] - y) * scale_y)
 
-        x = math.ceil((new_size[0] - base_size[0]) / 2)
-        y = math.ceil((new_size[1] - base_size[1]) / 2)
-
-        img = img.crop([
-            x, y, new_size[0] - x, new_size[1] - y
-        ]).resize(base_size, Image.LANCZOS)
+def zoom_in_effect(clip, zoom_ratio=0.04):
+    base_size = tuple(clip.size)
 
-        result = np.array(img)
-        img.close()
+    # Still images are decoded once; each frame is then a single resample of
+    # the zoomed crop straight to the output size
+    source = Image.fromarray(clip.img) if isinstance(clip, ImageClip) else None
 
-        return result
+    def effect(get_frame, t):
+        img = source if source is not None else Image.fromarray(get_frame(t))
+        box = zoom_box(t, base_size, img.size, zoom_ratio)
+        return np.asarray(img.resize(base_size, Image.LANCZOS, box=box))
 
     return clip.fl(effect)
 
@@ -80,27 +93,74 @@ def is_video_file(url):
     video_extensions = ['.mp4', '.mov', '.avi', '.mkv']
     return any(url.lower().endswith(ext) for ext in video_extensions)
 
-def create_video_background_video_v2(audio_url: str, semantic_structure: list, background_music_url: str, output_video_path: str):
+def create_video_background_video_v2(audio_url: str, semantic_structure: list, background_music_url: str, output_video_path: str, render_profile: str = DEFAULT_PROFILE):
+    cached_paths = []
     try:
-        # Download main audio file
-        print("Downloading main audio...")
-        audio_response = requests.get(audio_url)
+        target_size = (1080, 1920)  # YouTube Shorts dimensions
+        stats = PipelineStats()
+
+        # The voice-over is unique to the job, music and scene assets go through the shared asset cache.
+        # Voice-over and music download in the background while the scene assets go through the pipeline.
         audio_path = os.path.join(output_dir_for_semantic_videos_backgrounds, f"audio_{uuid.uuid4()}.mp3")
-        with open(audio_path, 'wb') as f:
-            f.write(audio_response.content)
-        
+        temp_files = [audio_path]  # To keep track of intermediate files for deletion
+        scene_assets = []  # (url, max_seconds) for every scene url, in timeline order
+        for i, scene in enumerate(semantic_structure):
+            scene_urls = scene['scene_image_url'].split(',')
+            # A scene video plays for its share of the scene, plus any silence gap it gets
+            # stretched over. The last scene has no gap after it; if the audio runs longer, the
+            # rest is filled by the composite's background and the source is not read any further.
+            gap_before = scene['start_time'] - semantic_structure[i-1]['end_time'] if i > 0 else 0
+            gap_after = semantic_structure[i+1]['start_time'] - scene['end_time'] if i < len(semantic_structure) - 1 else 0
+            max_seconds = (scene['end_time'] - scene['start_time']) / len(scene_urls) + max(gap_before, gap_after, 0)
+            scene_assets.extend((url, max_seconds) for url in scene_urls)
+
+        print(f"Downloading main audio, background music and {len(scene_assets)} scene assets...")
+        audio_download = download_manager.submit(audio_url, audio_path)
+        music_fetch = download_manager.executor.submit(asset_cache.fetch, background_music_url, ".mp3")
+
+        budget = ByteBudget(int(JOB_MAX_IN_FLIGHT_MB * 1024 * 1024))
+
+        def download_asset(asset):
+            url, max_seconds = asset
+            if is_video_file(url):
+                path = asset_cache.fetch(url, ".mp4", budget, max_seconds)
+            else:
+                path = asset_cache.fetch(url, ".jpg", budget)
+            cached_paths.append(path)
+            return url, max_seconds, path
+
+        def prepare_asset(downloaded):
+            url, max_seconds, path = downloaded
+            if not is_video_file(url):
+                # Decode and scale stills to the target width once, shared across jobs
+                return image_cache.load(url, path, target_size[0])
+            # Trim and scale videos to the target width once, while later assets are still downloading
+            prescaled_path = os.path.join(output_dir_for_semantic_videos_backgrounds, f"prescaled_{uuid.uuid4()}.mp4")
+            temp_files.append(prescaled_path)
+            return prescale_video(path, prescaled_path, max_seconds=max_seconds, width=target_size[0])
+
+        prepared_paths = run_pipeline(scene_assets, [
+            Stage("download", download_asset, workers=MAX_PARALLEL_DOWNLOADS, executor=download_manager.executor),
+            Stage("prepare", prepare_asset, workers=PREPARE_WORKERS)
+        ], stats)
+
+        bg_music_path = music_fetch.result()
+        cached_paths.append(bg_music_path)
+        audio_download.result()
+
+        # Prepared videos are paths to pre-scaled files, prepared images are pre-scaled arrays
+        scene_paths = []
+        next_path = 0
+        for scene in semantic_structure:
+            url_count = len(scene['scene_image_url'].split(','))
+            scene_paths.append(prepared_paths[next_path:next_path + url_count])
+            next_path += url_count
+
         # Load main audio file
         audio_clip = AudioFileClip(audio_path)
         audio_duration = audio_clip.duration
         print(f"Main audio duration: {audio_duration} seconds")
 
-        # Download background music
-        print("Downloading background music...")
-        bg_music_response = requests.get(background_music_url)
-        bg_music_path = os.path.join(output_dir_for_semantic_videos_backgrounds, f"background_music_{uuid.uuid4()}.mp3")
-        with open(bg_music_path, 'wb') as f:
-            f.write(bg_music_response.content)
-        
         # Load background music and set volume to 20%
         bg_music_clip = AudioFileClip(bg_music_path).volumex(0.14)
 
@@ -116,11 +176,8 @@ def create_video_background_video_v2(audio_url: str, semantic_structure: list, b
         # Combine the main audio and background music
         combined_audio = CompositeAudioClip([audio_clip, combined_bg_music_clip])
         
-        # Download and process semantic structure videos
+        # Process semantic structure videos
         video_clips = []
-        temp_files = [audio_path, bg_music_path]  # To keep track of intermediate files for deletion
-
-        target_size = (1080, 1920)  # YouTube Shorts dimensions
 
         for i, scene in enumerate(semantic_structure):
             semantic_sentence = scene['semantic_sentence']
@@ -136,28 +193,14 @@ def create_video_background_video_v2(audio_url: str, semantic_structure: list, b
 
             individual_duration = duration / len(scene_urls)
 
-            for url in scene_urls:
+            for url, scene_path in zip(scene_urls, scene_paths[i]):
                 if is_video_file(url):
-                    # Download and process video
-                    scene_response = requests.get(url)
-                    scene_path = os.path.join(output_dir_for_semantic_videos_backgrounds, f"scene_{uuid.uuid4()}.mp4")
-                    temp_files.append(scene_path)
-                    with open(scene_path, 'wb') as f:
-                        f.write(scene_response.content)
-                    
-                    scene_clip = VideoFileClip(scene_path).subclip(0, individual_duration).resize(width=target_size[0])
+                    # Process video, already scaled to the target width
+                    scene_clip = VideoFileClip(scene_path).subclip(0, individual_duration)
                 else:
-                    # Download and process image
-                    scene_response = requests.get(url)
-                    scene_path = os.path.join(output_dir_for_semantic_videos_backgrounds, f"scene_{uuid.uuid4()}.jpg")
-                    temp_files.append(scene_path)
-                    with open(scene_path, 'wb') as f:
-                        f.write(scene_response.content)
-                    
-                    # Create a video clip from the scene image with zoom effect
+                    # Create a video clip from the pre-scaled scene image with zoom effect
                     scene_clip = (ImageClip(scene_path)
                                   .set_duration(individual_duration)
-                                  .resize(width=target_size[0])  # Resize to fit the width of YouTube Shorts
                                   .fx(zoom_in_effect, zoom_ratio=0.04)
                                   .crossfadein(1.2))
 
@@ -179,7 +222,12 @@ def create_video_background_video_v2(audio_url: str, semantic_structure: list, b
         final_video = final_video.set_duration(audio_duration).set_audio(combined_audio)
         
         print(f"Writing final video to {output_video_path}...")
-        final_video.write_videofile(output_video_path, codec="libx264", audio_codec="aac", fps=24)
+        encode_start = time.time()
+        final_video.write_videofile(output_video_path, **write_videofile_args(render_profile, fps=24))
+        stats.add("encode", 1, time.time() - encode_start, 1)
+        stats.print_report()
+        budget.print_report()
+        print(f"Pre-scaled image cache: {image_cache.stats()}")
         
         # Clean up intermediate files
         print("Cleaning up temporary files...")
@@ -194,3 +242,5 @@ def create_video_background_video_v2(audio_url: str, semantic_structure: list, b
     
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        asset_cache.release(cached_paths)
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import uuid
 import os
 from concurrent.futures import ThreadPoolExecutor
 from fastapi.responses import JSONResponse
+from utils.render_profiles import DEFAULT_PROFILE, resolve_profile, write_videofile_args
 import os
 import uuid
 import requests
-from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, TextClip, CompositeVideoClip, concatenate_audioclips, ColorClip
+from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, CompositeVideoClip, concatenate_audioclips, ColorClip
+from utils.caption_overlay import AnimationTable, CaptionOverlay, scaled_sprite_cache
+from utils.text_rendering import sprite_cache
 import json
 import random
 
@@ -30,9 +33,14 @@ else:
 class CaptionVideoRequest(BaseModel):
     background_video_url: str
     captions: str
+    render_profile: Optional[str] = None  # Named encoder profile, defaults to RENDER_PROFILE_CAPTIONED_V1 or RENDER_PROFILE
 
 @router.post("/create-captioned-video/v1")
 async def create_captioned_video_v1_endpoint(request: CaptionVideoRequest):
+    try:
+        render_profile = resolve_profile(request.render_profile, "captioned_v1")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         print("Received request:")
         print(f"Background Video URL: {request.background_video_url}")
@@ -53,7 +61,7 @@ async def create_captioned_video_v1_endpoint(request: CaptionVideoRequest):
         print(response)
         
         # Submit video processing task to the executor
-        executor.submit(create_captioned_video_v1, background_video_path, captions, output_video_path)
+        executor.submit(create_captioned_video_v1, background_video_path, captions, output_video_path, render_profile)
         
         return response
     except Exception as e:
@@ -62,7 +70,7 @@ async def create_captioned_video_v1_endpoint(request: CaptionVideoRequest):
     
     
 
-def create_captioned_video_v1(background_video_path, captions, output_video_path):
+def create_captioned_video_v1(background_video_path, captions, output_video_path, render_profile=DEFAULT_PROFILE):
     try:
         # Load background video
         background_video = VideoFileClip(background_video_path)  # Load full video
@@ -73,8 +81,7 @@ def create_captioned_video_v1(background_video_path, captions, output_video_path
         # Resize background video to fit within 1080x1920
         background_video = background_video.resize(width=target_size[0]).set_position("center")
 
-        def scale_text_clip(txt_clip, start, end, special=False):
-            duration = end - start
+        def scale_factor(duration, special=False):
             if special:
                 def resize(t):
                     third_duration = duration / 3
@@ -94,10 +101,14 @@ def create_captioned_video_v1(background_video_path, captions, output_video_path
                         scale_factor = 1.1 - 0.1 * ((t - half_duration) / half_duration)
                     return scale_factor
 
-            return txt_clip.resize(lambda t: resize(t)).set_start(start).set_duration(duration)
+            return resize
+
+        # Animations are baked per output frame, at the frame rate the video is written with
+        render_args = write_videofile_args(render_profile, fps=background_video.fps)
+        fps = render_args["fps"]
 
-        # Create text clips for each caption
-        text_clips = []
+        # Index every caption on one overlay instead of compositing a clip per caption
+        overlay = CaptionOverlay(target_size)
         special_indices = random.sample(range(len(captions)), int(0.3 * len(captions)))  # Randomly select 30% of the indices
 
         for i, caption in enumerate(captions):
@@ -107,40 +118,27 @@ def create_captioned_video_v1(background_video_path, captions, output_video_path
             duration = end - start
             
             if duration > 0:
-                # Create the primary text clip
-                text_clip = (TextClip(txt, fontsize=100, font=font_path, color='white', stroke_color='white', stroke_width=4, kerning=8)
-                             .set_position(('center', target_size[1] // 3)))
-
-                # Create a second text clip with a black stroke
-                text_clip_black = (TextClip(txt, fontsize=106, font=font_path, color='transparent', stroke_color='black', stroke_width=6, kerning=8)
-                                   .set_position(('center', target_size[1] // 3)))
-
-                glow_offsets = [(0, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
-                glow_clips = [TextClip(txt, fontsize=108, font=font_path, color='transparent', stroke_color='rgb(206, 202, 198)', stroke_width=6, kerning=6)
-                              .set_position(('center', target_size[1] // 3))
-                              for x, y in glow_offsets]
-
-                text_clip_bold = text_clip.set_position(('center', target_size[1] // 3 + 1))
+                # The primary text and a second, larger layer with a black stroke drawn under it
+                style = (font_path, 100, 'white', 'white', 4, 8)
+                style_black = (font_path, 106, 'transparent', 'black', 6, 8)
+                sprite = sprite_cache.render(txt, *style)
+                sprite_black = sprite_cache.render(txt, *style_black)
 
                 # Determine if this caption should have the special transformation
-                special = i in special_indices
+                resize = scale_factor(duration, special=i in special_indices)
 
-                # Scale the text clips
-                scaled_text_clip = scale_text_clip(text_clip, start, end, special=special)
-                scaled_text_clip_black = scale_text_clip(text_clip_black, start, end, special=special)
-                scaled_glow_clips = [scale_text_clip(glow_clip, start, end, special=special) for glow_clip in glow_clips]
+                # Pop-in scaling is looked up per frame from pre-scaled sprites
+                overlay.add(AnimationTable(sprite_black, (txt,) + style_black, resize, duration, start, fps), start, end, 'center', target_size[1] // 3)
+                overlay.add(AnimationTable(sprite, (txt,) + style, resize, duration, start, fps), start, end, 'center', target_size[1] // 3)
 
-                # Append the clips in the correct order to create the desired effect
-                text_clips.append(scaled_text_clip_black)
-                # text_clips.extend(scaled_glow_clips)
-                text_clips.append(scaled_text_clip)
-                # text_clips.append(text_clip_bold)
+        print(f"Word sprite cache: {sprite_cache.stats()}")
 
         # Create final video with scrolling captions
-        final_video = CompositeVideoClip([background_video] + text_clips, size=target_size)
+        final_video = overlay.apply(CompositeVideoClip([background_video], size=target_size))
         
         # Save the final video
-        final_video.write_videofile(output_video_path, codec="libx264", audio_codec="aac")
+        final_video.write_videofile(output_video_path, **render_args)
+        print(f"Scaled sprite cache: {scaled_sprite_cache.stats()}")
         
         # Delete the original asset video
         os.remove(background_video_path)
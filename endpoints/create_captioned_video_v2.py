@@ -1,14 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import uuid
 import os
 from concurrent.futures import ThreadPoolExecutor
 from fastapi.responses import JSONResponse
+from utils.render_profiles import DEFAULT_PROFILE, resolve_profile, write_videofile_args
 import os
 import uuid
 import requests
-from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, TextClip, CompositeVideoClip, concatenate_audioclips, ColorClip
+from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, CompositeVideoClip, concatenate_audioclips, ColorClip
+from utils.text_layout import layout_caption_lines
+from utils.caption_overlay import CaptionOverlay
+from utils.text_rendering import sprite_cache, sprite_size
 import json
 import random
 
@@ -30,9 +34,14 @@ else:
 class CaptionVideoRequest(BaseModel):
     background_video_url: str
     captions: str
+    render_profile: Optional[str] = None  # Named encoder profile, defaults to RENDER_PROFILE_CAPTIONED_V2 or RENDER_PROFILE
 
 @router.post("/create-captioned-video/v2")
 async def create_captioned_video_v2_endpoint(request: CaptionVideoRequest):
+    try:
+        render_profile = resolve_profile(request.render_profile, "captioned_v2")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         print("Received request:")
         print(f"Background Video URL: {request.background_video_url}")
@@ -52,14 +61,14 @@ async def create_captioned_video_v2_endpoint(request: CaptionVideoRequest):
         print(response)
         
         # Submit video processing task to the executor
-        executor.submit(create_captioned_video_v2, background_video_path, captions, output_video_path)
+        executor.submit(create_captioned_video_v2, background_video_path, captions, output_video_path, render_profile)
         
         return response
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))  
 
-def create_captioned_video_v2(background_video_path, captions, output_video_path):
+def create_captioned_video_v2(background_video_path, captions, output_video_path, render_profile=DEFAULT_PROFILE):
     try:
         # Load background video
         background_video = VideoFileClip(background_video_path)  # Load full video
@@ -70,75 +79,37 @@ def create_captioned_video_v2(background_video_path, captions, output_video_path
         # Resize background video to fit within 1080x1920
         background_video = background_video.resize(width=target_size[0]).set_position("center")
 
-        def create_text_clips(captions, framesize, font=font_path, fontsize=70, color='white'):
-            word_clips = []
+        def create_caption_overlay(captions, framesize, font=font_path, fontsize=70, color='white'):
+            overlay = CaptionOverlay(framesize)
             y_pos = framesize[1] * 3 // 4
             frame_width = framesize[0]
-            space_width = TextClip(" ", font=font, fontsize=fontsize, color=color).size[0]
-            
-            i = 0
-            while i < len(captions):
-                line_clips = []
-                total_width = 0
-                max_end_time = 0
-                line_completed = False
-
-                # Determine the end of the current line
-                j = 0
-                while i + j < len(captions) and j < 3 and not line_completed:
-                    txt = captions[i + j]['word']
-                    if '.' in txt or '?' in txt or ',' in txt:
-                        line_completed = True
-                    j += 1
-
-                # Calculate the total width of the line
-                for k in range(j):
-                    txt = captions[i + k]['word']
-                    word_clip = TextClip(txt, font=font, fontsize=fontsize, color=color, stroke_color='black', stroke_width=4)
-                    word_width, _ = word_clip.size
-                    total_width += word_width
-                    if k < j - 1:
-                        total_width += space_width
-                    if captions[i + k]['end'] > max_end_time:
-                        max_end_time = captions[i + k]['end']
-
-                x_pos = (frame_width - total_width) // 2  # Center the total width
-
-                for k in range(j):
-                    caption = captions[i + k]
-                    txt = caption['word']
-                    start = caption['start']
-                    end = caption['end']
-                    duration = end - start
-
-                    word_clip = TextClip(txt, font=font, fontsize=fontsize, color=color, stroke_color='black', stroke_width=4).set_start(start).set_duration(max_end_time - start)
-                    word_width, word_height = word_clip.size
-                    
-                    # Position the word clip
-                    word_clip = word_clip.set_position((x_pos, y_pos))
-                    x_pos += word_width + space_width
-                    line_clips.append(word_clip)
-
-                # Append the line clips to word_clips
-                word_clips.extend(line_clips)
-
-                # Add a blank clip to clear the line after the last word is done
-                clear_clip = ColorClip(size=(frame_width, word_height + 40), color=(0, 0, 0, 0)).set_start(max_end_time).set_duration(0.01).set_position((0, y_pos))
-                word_clips.append(clear_clip)
-
-                # Move to the next line
-                i += j
-
-            return word_clips
-
-        # Create text clips
-        text_clips = create_text_clips(captions, target_size)
+            style = dict(stroke_color='black', stroke_width=4)
+
+            # Lines and positions come from font metrics, nothing is rasterized to measure it
+            space_width = sprite_size(" ", font, fontsize)[0]
+            widths = [sprite_size(caption['word'], font, fontsize, **style)[0] for caption in captions]
+            layout = layout_caption_lines(captions, widths, space_width, frame_width)
+
+            # Every word stays up until its line is cleared. Words that would be cleared
+            # before they appear are never drawn, or rasterized.
+            for k, caption in enumerate(captions):
+                start = caption['start']
+                clear_time = layout["clear_time"][k]
+                if clear_time > start:
+                    sprite = sprite_cache.render(caption['word'], font, fontsize, color=color, **style)
+                    overlay.add(sprite, start, clear_time, int(layout["x"][k]), y_pos)
+
+            return overlay
+
+        # Create the caption overlay
+        overlay = create_caption_overlay(captions, target_size)
+        print(f"Word sprite cache: {sprite_cache.stats()}")
 
         # Create final video with scrolling captions
-        final_video = CompositeVideoClip([background_video] + text_clips, size=target_size)
+        final_video = overlay.apply(CompositeVideoClip([background_video], size=target_size))
         
         # Save the final video
-        final_video.write_videofile(output_video_path, codec="libx264", audio_codec="aac")
+        final_video.write_videofile(output_video_path, **write_videofile_args(render_profile))
         
         # Delete the original asset video
         os.remove(background_video_path)
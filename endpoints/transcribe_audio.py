@@ -1,37 +1,62 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import whisper
+from utils.whisper_models import DEFAULT_MODEL, QUANTIZED_DEFAULT, model_spec, validate_model_name
+from utils.transcription_executor import TranscriptionQueueFull, run_transcription
+from utils.transcription_cache import cache_key, transcription_cache
+from utils.long_audio import transcribe_long_audio
 import aiohttp
-import os
 import time
 
 router = APIRouter()
 
-model = whisper.load_model("tiny.en")
-
 class TranscriptionRequest(BaseModel):
     voice_over_url: str
+    model: str = DEFAULT_MODEL
+    quantized: bool = QUANTIZED_DEFAULT
+    long_audio: bool = False
+    vad: bool = False
 
 @router.post("/transcribe/")
 async def transcribe_audio(request: TranscriptionRequest):
     try:
-        audio_path = "audio.mp3"
+        validate_model_name(request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model_name = model_spec(request.model, request.quantized)
+
+    try:
         async with aiohttp.ClientSession() as session:
             async with session.get(request.voice_over_url) as response:
                 if response.status != 200:
                     raise HTTPException(status_code=404, detail="Audio file not found")
-                with open(audio_path, "wb") as f:
-                    f.write(await response.read())
+                audio_bytes = await response.read()
 
         start_time = time.time()
-        result = model.transcribe(audio_path)
+        key = cache_key(audio_bytes, model_name, word_timestamps=False, vad=request.vad)
+        # A word-level run of the same audio already holds the full transcript
+        result = await transcription_cache.get_first_async([cache_key(audio_bytes, model_name, word_timestamps=True, vad=request.vad), key])
+        cache_hit = result is not None
+        if not cache_hit:
+            if request.long_audio:
+                result = await transcribe_long_audio(audio_bytes, model_name, word_timestamps=False, vad=request.vad)
+            else:
+                result = await run_transcription(audio_bytes, model_name, vad=request.vad)
+            transcription_cache.put(key, result)
         end_time = time.time()
 
-        os.remove(audio_path)
-
         return {
             "transcript": result['text'],
+            "model": model_name,
+            "cache_hit": cache_hit,
             "transcription_time": f"{end_time - start_time:.2f} seconds"
         }
+    except HTTPException:
+        raise
+    except TranscriptionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/transcribe/cache-stats/")
+async def transcribe_cache_stats():
+    return transcription_cache.stats()
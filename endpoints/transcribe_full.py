@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from utils.whisper_models import DEFAULT_MODEL, QUANTIZED_DEFAULT, model_spec, validate_model_name
+from utils.transcription_executor import TranscriptionQueueFull, run_transcription
+from utils.transcription_cache import cache_key, transcription_cache
+from utils.long_audio import transcribe_long_audio
+import aiohttp
+import time
+
+
+router = APIRouter()
+
+class TranscriptionRequest(BaseModel):
+    voice_over_url: str
+    model: str = DEFAULT_MODEL
+    quantized: bool = QUANTIZED_DEFAULT
+    long_audio: bool = False
+    vad: bool = False
+
+@router.post("/transcribe/full/")
+async def transcribe_full(request: TranscriptionRequest):
+    try:
+        validate_model_name(request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model_name = model_spec(request.model, request.quantized)
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(request.voice_over_url) as response:
+                if response.status != 200:
+                    raise HTTPException(status_code=404, detail="Audio file not found")
+                audio_bytes = await response.read()
+
+        # Shares cache entries with /transcribe/word-level/, a single
+        # word_timestamps=True decode serves the transcript and the word timings
+        start_time = time.time()
+        key = cache_key(audio_bytes, model_name, word_timestamps=True, vad=request.vad)
+        result = await transcription_cache.get_async(key)
+        # Entries cached before every transcription recorded its duration are decoded again
+        cache_hit = result is not None and 'duration' in result
+        if not cache_hit:
+            if request.long_audio:
+                result = await transcribe_long_audio(audio_bytes, model_name, word_timestamps=True, vad=request.vad)
+            else:
+                result = await run_transcription(audio_bytes, model_name, vad=request.vad, word_timestamps=True)
+            transcription_cache.put(key, result)
+        end_time = time.time()
+
+        segments = [
+            {
+                "id": segment['id'],
+                "start": segment['start'],
+                "end": segment['end'],
+                "text": segment['text']
+            }
+            for segment in result['segments']
+        ]
+
+        word_transcripts = [
+            {
+                "word": word['word'],
+                "start": word['start'],
+                "end": word['end']
+            }
+            for segment in result['segments']
+            for word in segment['words']
+        ]
+
+        return {
+            "transcript": result['text'],
+            "segments": segments,
+            "word_transcripts": word_transcripts,
+            "duration": result['duration'],
+            "model": model_name,
+            "cache_hit": cache_hit,
+            "transcription_time": f"{end_time - start_time:.2f} seconds"
+        }
+    except HTTPException:
+        raise
+    except TranscriptionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,32 +1,59 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import whisper
+from utils.whisper_models import DEFAULT_MODEL, QUANTIZED_DEFAULT, model_spec, validate_model_name
+from utils.transcription_executor import TranscriptionQueueFull
+from utils.transcription_batcher import batcher
+from utils.transcription_cache import cache_key, transcription_cache
+from utils.long_audio import stream_transcription, transcribe_long_audio
 import aiohttp
-import os
+import json
 import time
-import uuid
 
 
 router = APIRouter()
 
-model = whisper.load_model("tiny.en")
-
 class TranscriptionRequest(BaseModel):
     voice_over_url: str
+    model: str = DEFAULT_MODEL
+    quantized: bool = QUANTIZED_DEFAULT
+    long_audio: bool = False
+    vad: bool = False
+
+class StreamingTranscriptionRequest(BaseModel):
+    voice_over_url: str
+    model: str = DEFAULT_MODEL
+    quantized: bool = QUANTIZED_DEFAULT
+    format: str = "ndjson"
+    vad: bool = False
 
 @router.post("/transcribe/word-level/")
 async def transcribe_word_level(request: TranscriptionRequest):
     try:
-        audio_path = f"{uuid.uuid4()}.mp3"
+        validate_model_name(request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model_name = model_spec(request.model, request.quantized)
+
+    try:
         async with aiohttp.ClientSession() as session:
             async with session.get(request.voice_over_url) as response:
                 if response.status != 200:
                     raise HTTPException(status_code=404, detail="Audio file not found")
-                with open(audio_path, "wb") as f:
-                    f.write(await response.read())
+                audio_bytes = await response.read()
 
         start_time = time.time()
-        result = model.transcribe(audio_path, word_timestamps=True)
+        key = cache_key(audio_bytes, model_name, word_timestamps=True, vad=request.vad)
+        result = await transcription_cache.get_async(key)
+        cache_hit = result is not None
+        batch_size = 0
+        if not cache_hit:
+            if request.long_audio:
+                result = await transcribe_long_audio(audio_bytes, model_name, word_timestamps=True, vad=request.vad)
+            else:
+                result = await batcher.transcribe(audio_bytes, model_name, vad=request.vad)
+                batch_size = result.pop('batch')['batch_size']
+            transcription_cache.put(key, result)
         end_time = time.time()
 
         word_transcripts = [
@@ -39,11 +66,108 @@ async def transcribe_word_level(request: TranscriptionRequest):
             for word in segment['words']
         ]
 
-        os.remove(audio_path)
-
         return {
             "word_transcripts": word_transcripts,
+            "model": model_name,
+            "batch_size": batch_size,
+            "cache_hit": cache_hit,
             "transcription_time": f"{end_time - start_time:.2f} seconds"
         }
+    except HTTPException:
+        raise
+    except TranscriptionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/transcribe/word-level/batch-stats/")
+async def transcribe_word_level_batch_stats():
+    return batcher.summary()
+
+def format_event(event: dict, stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+def segment_event(segment: dict) -> dict:
+    return {
+        "type": "segment",
+        "id": segment['id'],
+        "start": segment['start'],
+        "end": segment['end'],
+        "text": segment['text'],
+        "words": [
+            {
+                "word": word['word'],
+                "start": word['start'],
+                "end": word['end']
+            }
+            for word in segment['words']
+        ]
+    }
+
+async def replay_cached(result: dict):
+    yield result
+
+@router.post("/transcribe/word-level/stream/")
+async def transcribe_word_level_stream(request: StreamingTranscriptionRequest):
+    if request.format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    try:
+        validate_model_name(request.model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model_name = model_spec(request.model, request.quantized)
+
+    start_time = time.time()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(request.voice_over_url) as response:
+                if response.status != 200:
+                    raise HTTPException(status_code=404, detail="Audio file not found")
+                audio_bytes = await response.read()
+
+        key = cache_key(audio_bytes, model_name, word_timestamps=True, vad=request.vad)
+        cached = await transcription_cache.get_async(key)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        time_to_first_word = None
+        try:
+            if cached is not None:
+                parts = replay_cached(cached)
+            else:
+                parts = stream_transcription(audio_bytes, model_name, vad=request.vad)
+
+            results = []
+            async for part in parts:
+                results.append(part)
+                for segment in part['segments']:
+                    if time_to_first_word is None and segment['words']:
+                        time_to_first_word = time.time() - start_time
+                    yield format_event(segment_event(segment), request.format)
+
+            if cached is None and results:
+                transcription_cache.put(key, {
+                    "text": "".join(part['text'] for part in results),
+                    "segments": [segment for part in results for segment in part['segments']],
+                    "language": results[0]['language'],
+                    "duration": results[0]['duration']
+                })
+
+            end_time = time.time()
+            yield format_event({
+                "type": "done",
+                "model": model_name,
+                "cache_hit": cached is not None,
+                "time_to_first_word": round(time_to_first_word, 3) if time_to_first_word is not None else None,
+                "transcription_time": f"{end_time - start_time:.2f} seconds"
+            }, request.format)
+        except Exception as e:
+            yield format_event({"type": "error", "detail": str(e)}, request.format)
+
+    media_type = "text/event-stream" if request.format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
@@ -1,7 +1,8 @@
 import os
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from endpoints import create_background_video_v1, create_captioned_video_v1, create_background_video_v2, create_captioned_video_v2, transcribe_audio, transcribe_word_level, upload_to_youtube
+from utils.transcription_executor import shutdown_executor
+from endpoints import create_background_video_v1, create_captioned_video_v1, create_background_video_v2, create_captioned_video_v2, transcribe_audio, transcribe_word_level, transcribe_full, upload_to_youtube
 
 app = FastAPI()
 
@@ -11,7 +12,9 @@ output_dirs = [
     "Final_Videos", 
     "SemanticVideosBackgrounds", 
     "FinalSemanticVideos", 
-    "tokens"
+    "tokens",
+    "TranscriptionCache",
+    "AssetCache"
 ]
 
 
@@ -22,9 +25,14 @@ for dir in output_dirs:
 async def read_root():
     return {"message": "Server working"}
 
+@app.on_event("shutdown")
+def stop_transcription_workers():
+    shutdown_executor()
+
 # Include routers from endpoint modules
 app.include_router(transcribe_audio.router)
 app.include_router(transcribe_word_level.router)
+app.include_router(transcribe_full.router)
 app.include_router(create_background_video_v1.router)
 app.include_router(create_captioned_video_v1.router)
 app.include_router(create_background_video_v2.router)
@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+
+class ArrayCache:
+    """An LRU of read-only NumPy arrays, bounded by their total size in bytes.
+
+    get(key, factory) returns the cached array, or makes one with factory(),
+    freezes and stores it. When a version is given it has to equal the one
+    stored with the entry, otherwise the entry is stale and made again.
+    """
+
+    def __init__(self, max_memory_mb: float):
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.bytes = 0
+        self.peak_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (version, read-only array)
+        self._lock = threading.Lock()
+
+    def get(self, key, factory, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        array = factory()
+        array.flags.writeable = False
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self.bytes -= entry[1].nbytes
+                self._entries[key] = (version, array)
+                self._entries.move_to_end(key)
+                self.bytes += array.nbytes
+                while self.bytes > self.max_bytes and len(self._entries) > 1:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+                self.peak_bytes = max(self.peak_bytes, self.bytes)
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None else array
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "memory_mb": round(self.bytes / (1024 * 1024), 1),
+            "peak_memory_mb": round(self.peak_bytes / (1024 * 1024), 1)
+        }
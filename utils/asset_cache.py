@@ -0,0 +1,174 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from utils.download_manager import DOWNLOAD_TIMEOUT, ByteBudget, download_manager
+from utils.partial_fetch import fetch_time_window
+from utils.video_processing import strip_url_params
+
+CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "AssetCache")
+MAX_DISK_MB = float(os.getenv("ASSET_CACHE_MAX_MB", "10240"))
+
+
+class AssetCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, max_disk_mb: float = MAX_DISK_MB):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pins = {}  # path -> number of jobs currently using it
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(strip_url_params(url).encode()).hexdigest()
+
+    def _remote_validators(self, url: str):
+        try:
+            response = download_manager.session.head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+            if response.status_code != 200:
+                return None
+        except Exception:
+            return None
+        return {
+            "etag": response.headers.get("ETag"),
+            "content_length": response.headers.get("Content-Length")
+        }
+
+    def _is_fresh(self, meta: dict, validators: dict) -> bool:
+        if validators is None:
+            # Origin unreachable for validation, trust what we have
+            return True
+        if meta.get("etag") and validators["etag"]:
+            return meta["etag"] == validators["etag"]
+        if meta.get("content_length") and validators["content_length"]:
+            return meta["content_length"] == validators["content_length"]
+        return True
+
+    def _pin(self, path: str):
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+
+    def release(self, paths: list):
+        with self._lock:
+            for path in paths:
+                count = self._pins.get(path, 0) - 1
+                if count > 0:
+                    self._pins[path] = count
+                else:
+                    self._pins.pop(path, None)
+
+    def _cached(self, data_path: str, meta_path: str, validators: dict) -> bool:
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return False
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            # Missing or unreadable metadata is a miss, the entry is fetched and written again
+            return False
+        if not self._is_fresh(meta, validators):
+            return False
+        os.utime(data_path)
+        return True
+
+    def fetch(self, url: str, suffix: str, budget: ByteBudget = None, max_seconds: float = None) -> str:
+        # With max_seconds, only the first max_seconds of a video are needed and
+        # a range-limited partial copy is cached next to (never instead of) the full file
+        key = self._key(url)
+        data_path = os.path.join(self.cache_dir, f"{key}{suffix}")
+        meta_path = os.path.join(self.cache_dir, f"{key}.json")
+        validators = self._remote_validators(url)
+
+        if max_seconds is not None:
+            self._pin(data_path)
+            if self._cached(data_path, meta_path, validators):
+                with self._lock:
+                    self.hits += 1
+                return data_path
+            self.release([data_path])
+            partial_key = f"{key}_{int(math.ceil(max_seconds))}s"
+            data_path = os.path.join(self.cache_dir, f"{partial_key}{suffix}")
+            meta_path = os.path.join(self.cache_dir, f"{partial_key}.json")
+
+        # Pinned files are never evicted; callers release them when the job is done
+        self._pin(data_path)
+        try:
+            if self._cached(data_path, meta_path, validators):
+                with self._lock:
+                    self.hits += 1
+                return data_path
+
+            with self._lock:
+                self.misses += 1
+            part_path = f"{data_path}.{uuid.uuid4()}.part"
+            try:
+                partial = max_seconds is not None and fetch_time_window(url, part_path, int(math.ceil(max_seconds)), budget)
+                if not partial:
+                    download_manager.download(url, part_path, budget)
+                os.replace(part_path, data_path)
+            finally:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+            meta = dict(validators or {}, url=strip_url_params(url), size=os.path.getsize(data_path), partial=bool(partial), fetched_at=time.time())
+            # Written next to the entry and moved into place, so readers never see a partial file
+            meta_tmp_path = f"{meta_path}.{uuid.uuid4()}.part"
+            try:
+                with open(meta_tmp_path, "w") as f:
+                    json.dump(meta, f)
+                os.replace(meta_tmp_path, meta_path)
+            finally:
+                if os.path.exists(meta_tmp_path):
+                    os.remove(meta_tmp_path)
+
+            self._evict()
+            return data_path
+        except Exception:
+            self.release([data_path])
+            raise
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith((".json", ".part")):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                # Partial fetches are sparse, so count allocated blocks rather than the apparent size
+                entries.append((stat.st_mtime, min(stat.st_size, stat.st_blocks * 512), path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_disk_bytes:
+                    break
+                if path in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                    os.remove(os.path.splitext(path)[0] + ".json")
+                except OSError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+asset_cache = AssetCache()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+SAMPLE_RATE = 16000
+
+
+def _ffmpeg_decode(source: str, data: bytes = None, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    cmd = [
+        FFMPEG_BINARY,
+        "-threads", "0",
+        "-i", source,
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+    process = subprocess.run(cmd, input=data, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {process.stderr.decode(errors='ignore')[-500:]}")
+    return np.frombuffer(process.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    try:
+        return _ffmpeg_decode("pipe:0", data, sample_rate)
+    except RuntimeError:
+        # Containers that keep their index at the end (e.g. non-faststart m4a)
+        # cannot be demuxed from a pipe, those need a seekable file
+        with tempfile.NamedTemporaryFile(suffix=".audio") as f:
+            f.write(data)
+            f.flush()
+            return _ffmpeg_decode(f.name, sample_rate=sample_rate)
+
+
+def load_audio(audio, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    if isinstance(audio, (bytes, bytearray)):
+        return decode_audio_bytes(bytes(audio), sample_rate)
+    if isinstance(audio, str):
+        return _ffmpeg_decode(audio, sample_rate=sample_rate)
+    return audio
@@ -0,0 +1,226 @@
+import os
+
+from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, concatenate_audioclips
+
+from utils.ffmpeg import probe_duration, probe_keyframes, probe_video, run_ffmpeg
+from utils.render_profiles import DEFAULT_PROFILE, PROFILES, audio_ffmpeg_args, ffmpeg_args, write_videofile_args
+
+# Background timelines can be rendered by moviepy frame by frame in Python, or
+# compiled into one ffmpeg filter graph and rendered by a single subprocess
+RENDER_BACKEND = os.getenv("BACKGROUND_RENDER_BACKEND", "moviepy")
+
+# When every clip already has the same codec, size, frame rate, pixel format and
+# encoder parameters and all cuts land on keyframes, the video track is assembled with stream copy
+# and only the audio mix is encoded. Anything else falls back to RENDER_BACKEND.
+STREAM_COPY_ENABLED = os.getenv("BACKGROUND_STREAM_COPY", "1") == "1"
+STREAM_COPY_CODECS = {"h264"}
+STREAM_COPY_PIX_FMTS = {"yuv420p"}
+STREAM_COPY_MATCHING = ("profile", "level", "time_base", "extradata_hash")
+
+CLIP_SECONDS = 5
+MUSIC_VOLUME = 0.14
+
+
+def plan_timeline(durations: list, audio_duration: float, clip_seconds: float = CLIP_SECONDS) -> list:
+    # Loops over the clips, up to clip_seconds of each, until the audio is covered.
+    # Returns (clip index, seconds) for every segment of the timeline.
+    segments = []
+    total_duration = 0
+    clip_index = 0
+    while total_duration < audio_duration:
+        duration = min(clip_seconds, durations[clip_index])
+        if total_duration + duration > audio_duration:
+            duration = audio_duration - total_duration
+        segments.append((clip_index, duration))
+        total_duration += duration
+        clip_index = (clip_index + 1) % len(durations)
+    return segments
+
+
+def render_moviepy(video_paths: list, audio_path: str, music_path: str, output_path: str, profile: str = DEFAULT_PROFILE):
+    video_clips = [VideoFileClip(path, audio=False).set_position("center") for path in video_paths]
+    for i, video_clip in enumerate(video_clips):
+        print(f"Video {i+1} duration: {video_clip.duration} seconds")
+
+    # Get the length of the main audio file
+    print("Loading main audio file...")
+    audio_clip = AudioFileClip(audio_path)
+    audio_duration = audio_clip.duration
+    print(f"Main audio duration: {audio_duration} seconds")
+
+    # Load background music and set volume to 14%
+    bg_music_clip = AudioFileClip(music_path).volumex(MUSIC_VOLUME)
+
+    # Manually loop the background music to match the duration of the main audio
+    bg_music_clips = []
+    total_bg_duration = 0
+    while total_bg_duration < audio_duration:
+        bg_music_clips.append(bg_music_clip)
+        total_bg_duration += bg_music_clip.duration
+
+    combined_bg_music_clip = concatenate_audioclips(bg_music_clips).subclip(0, audio_duration)
+
+    # Combine the main audio and background music
+    combined_audio = CompositeAudioClip([audio_clip, combined_bg_music_clip])
+
+    # Concatenate video clips to match audio length
+    print("Concatenating video clips to match audio duration...")
+    segments = plan_timeline([clip.duration for clip in video_clips], audio_duration)
+    final_clips = [video_clips[index].subclip(0, duration) for index, duration in segments]
+
+    final_video = concatenate_videoclips(final_clips, method="compose")
+    final_video = final_video.set_audio(combined_audio)
+
+    print(f"Writing final video to {output_path}...")
+    final_video.write_videofile(output_path, **write_videofile_args(profile))
+
+
+def build_filter_graph(videos: list, segments: list, voice_input: int, music_input: int) -> str:
+    # Same layout as concatenate_videoclips(method="compose"): every segment is
+    # centered on a black canvas as large as the largest clip, at the highest frame rate.
+    # Segment k reads its own input k; splitting one decoded stream between segments
+    # would make ffmpeg buffer every decoded frame until the later segments are reached.
+    width = max(video["width"] for video in videos)
+    height = max(video["height"] for video in videos)
+    frame_rate = max(videos, key=lambda video: video["fps"])["frame_rate"]
+
+    filters = []
+    for k, (index, duration) in enumerate(segments):
+        filters.append(
+            f"[{k}:v]trim=duration={duration:.6f},setpts=PTS-STARTPTS,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1,fps={frame_rate}[v{k}]"
+        )
+    filters.append(f"{''.join(f'[v{k}]' for k in range(len(segments)))}concat=n={len(segments)}:v=1:a=0,format=yuv420p[v]")
+    filters.append(audio_mix_filter(voice_input, music_input))
+    return ";".join(filters)
+
+
+def audio_mix_filter(voice_input: int, music_input: int) -> str:
+    # amix halves both inputs; the music loops forever, so the factor is constant and undone by volume=2
+    return (f"[{music_input}:a]volume={MUSIC_VOLUME}[music];"
+            f"[{voice_input}:a][music]amix=inputs=2:duration=first:dropout_transition=0,volume=2[a]")
+
+
+def render_ffmpeg(video_paths: list, audio_path: str, music_path: str, output_path: str, profile: str = DEFAULT_PROFILE):
+    videos = [probe_video(path) for path in video_paths]
+    audio_duration = probe_duration(audio_path)
+    print(f"Main audio duration: {audio_duration} seconds")
+
+    segments = plan_timeline([video["duration"] for video in videos], audio_duration)
+    args = []
+    for index, duration in segments:
+        # Each segment opens its clip again and only reads what it uses
+        args += ["-t", f"{duration:.6f}", "-i", video_paths[index]]
+    args += ["-i", audio_path, "-stream_loop", "-1", "-i", music_path]
+    graph = build_filter_graph(videos, segments, voice_input=len(segments), music_input=len(segments) + 1)
+
+    print(f"Rendering {len(segments)} segments with one ffmpeg filter graph to {output_path}...")
+    run_ffmpeg(args + [
+        "-filter_complex", graph, "-map", "[v]", "-map", "[a]", "-t", f"{audio_duration:.6f}"
+    ] + ffmpeg_args(profile) + [output_path])
+
+
+def is_stream_copy_ready(path: str, height: int) -> bool:
+    # Whether a source can skip re-encoding and go straight into a stream-copied timeline
+    try:
+        video = probe_video(path)
+    except (RuntimeError, OSError, KeyError, IndexError, ValueError):
+        return False
+    return video["codec"] in STREAM_COPY_CODECS and video["pix_fmt"] in STREAM_COPY_PIX_FMTS and video["height"] == height
+
+
+def _stream_copy_blocker(video_paths: list, videos: list, segments: list, profile: str):
+    # Returns why the timeline cannot be stream copied, or None when it can
+    reference = videos[0]
+    for path, video in zip(video_paths, videos):
+        if video["codec"] not in STREAM_COPY_CODECS or video["pix_fmt"] not in STREAM_COPY_PIX_FMTS:
+            return f"{os.path.basename(path)} is {video['codec']}/{video['pix_fmt']}"
+        if (video["width"], video["height"], video["frame_rate"]) != (reference["width"], reference["height"], reference["frame_rate"]):
+            return f"{os.path.basename(path)} is {video['width']}x{video['height']}@{video['frame_rate']}, " \
+                   f"expected {reference['width']}x{reference['height']}@{reference['frame_rate']}"
+        # The concat demuxer keeps the first clip's stream parameters, so every clip has to be
+        # encoded with the same profile, level, time base and SPS/PPS for the copy to decode
+        for key in STREAM_COPY_MATCHING:
+            if video[key] != reference[key]:
+                return f"{os.path.basename(path)} has {key} {video[key]}, expected {reference[key]}"
+
+    # Stream copy keeps the source frame rate, so it cannot honour a profile that changes it
+    if PROFILES[profile]["fps"] and abs(PROFILES[profile]["fps"] - reference["fps"]) > 0.01:
+        return f"render profile '{profile}' needs {PROFILES[profile]['fps']} fps, sources are {reference['frame_rate']}"
+
+    # Every segment starts at its clip's first frame, which has to be a keyframe. A segment
+    # that stops before its clip ends has to stop on a keyframe, except the last one, which
+    # only ends the output.
+    frame_seconds = 1 / reference["fps"]
+    keyframes = {}
+    for k, (index, duration) in enumerate(segments):
+        if index not in keyframes:
+            keyframes[index] = probe_keyframes(video_paths[index], CLIP_SECONDS + frame_seconds)
+            if not keyframes[index] or keyframes[index][0] > frame_seconds / 2:
+                return f"{os.path.basename(video_paths[index])} does not start on a keyframe"
+        if k == len(segments) - 1 or abs(duration - videos[index]["duration"]) <= frame_seconds:
+            continue
+        if not any(abs(keyframe - duration) <= frame_seconds / 2 for keyframe in keyframes[index]):
+            return f"{os.path.basename(video_paths[index])} has no keyframe at {duration:.2f}s"
+    return None
+
+
+def render_stream_copy(video_paths: list, audio_path: str, music_path: str, output_path: str, profile: str = DEFAULT_PROFILE) -> bool:
+    # Returns False, without writing output_path, when the timeline needs a full re-encode
+    try:
+        videos = [probe_video(path) for path in video_paths]
+        audio_duration = probe_duration(audio_path)
+        segments = plan_timeline([video["duration"] for video in videos], audio_duration)
+        blocker = _stream_copy_blocker(video_paths, videos, segments, profile)
+    except (RuntimeError, OSError, KeyError, IndexError, ValueError) as e:
+        blocker = f"probing failed ({e})"
+    if blocker is not None:
+        print(f"Stream copy not possible: {blocker}, re-encoding")
+        return False
+
+    list_path = f"{output_path}.concat.txt"
+    try:
+        with open(list_path, "w") as f:
+            for index, duration in segments:
+                escaped = os.path.abspath(video_paths[index]).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if abs(duration - videos[index]["duration"]) > 1 / videos[index]["fps"]:
+                    f.write(f"outpoint {duration:.6f}\n")
+
+        print(f"Stream copying {len(segments)} segments to {output_path}...")
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_path, "-i", audio_path, "-stream_loop", "-1", "-i", music_path,
+            "-filter_complex", audio_mix_filter(voice_input=1, music_input=2), "-map", "0:v", "-map", "[a]",
+            "-t", f"{audio_duration:.6f}", "-c:v", "copy"
+        ] + audio_ffmpeg_args(profile) + [output_path])
+        return True
+    except RuntimeError as e:
+        print(f"Stream copy failed ({e}), re-encoding")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+
+
+RENDER_BACKENDS = {
+    "moviepy": render_moviepy,
+    "ffmpeg": render_ffmpeg
+}
+
+
+def render_background(video_paths: list, audio_path: str, music_path: str, output_path: str, backend: str = None, profile: str = DEFAULT_PROFILE,
+                      prepare_fallback=None, originals: set = None):
+    # Stream copy is only tried when every path is in originals, the untouched cached sources; anything
+    # else is an intermediate encode that must not end up in the output as it is. prepare_fallback, when
+    # given, maps the paths to the inputs the re-encoding backend should use instead.
+    backend = backend or RENDER_BACKEND
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend '{backend}', expected one of {sorted(RENDER_BACKENDS)}")
+    if STREAM_COPY_ENABLED and originals is not None and all(path in originals for path in video_paths):
+        if render_stream_copy(video_paths, audio_path, music_path, output_path, profile):
+            return
+    if prepare_fallback is not None:
+        video_paths = prepare_fallback(video_paths)
+    RENDER_BACKENDS[backend](video_paths, audio_path, music_path, output_path, profile)
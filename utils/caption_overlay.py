@@ -0,0 +1,137 @@
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils.text_rendering import SpriteCache
+
+# Scaled animation frames are kept apart from the word sprites, under their own budget
+SCALED_SPRITE_CACHE_MB = float(os.getenv("SCALED_SPRITE_CACHE_MB", "64"))
+
+
+class CaptionOverlay:
+    """Draws every caption of a video onto its frames in one pass.
+
+    Captions are indexed by start time: with starts sorted, the captions
+    playing at t all start in [t - longest duration, t], so each frame only
+    looks at a narrow slice and blends the few that are still playing.
+    Per-frame cost follows the visible words, not the length of the script.
+    """
+
+    def __init__(self, size: tuple):
+        self.size = size
+        self._items = []  # (start, end, sprite, x, y) in layer order
+        self._index = None
+
+    def add(self, sprite, start: float, end: float, x, y: int):
+        # sprite is an RGBA array, or a function of the caption's local time returning one;
+        # x may be 'center' to center the sprite horizontally at its current width
+        if end > start:
+            self._items.append((start, end, sprite, x, y))
+            self._index = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def _build_index(self):
+        starts = np.array([item[0] for item in self._items], dtype=float)
+        order = np.argsort(starts, kind="stable")
+        ends = np.array([item[1] for item in self._items], dtype=float)
+        self._index = {
+            "starts": starts[order],
+            "ends": ends[order],
+            "order": order,
+            "max_duration": float((ends - starts).max()) if len(starts) else 0.0
+        }
+
+    def active(self, t: float) -> np.ndarray:
+        # Indices of the captions playing at t (start <= t < end), in layer order
+        if self._index is None:
+            self._build_index()
+        index = self._index
+        lo = np.searchsorted(index["starts"], t - index["max_duration"], side="left")
+        hi = np.searchsorted(index["starts"], t, side="right")
+        candidates = np.arange(lo, hi)
+        playing = candidates[index["ends"][candidates] > t]
+        return np.sort(index["order"][playing])
+
+    def blend(self, frame: np.ndarray, t: float) -> np.ndarray:
+        active = self.active(t)
+        if not len(active):
+            return frame
+        frame = np.array(frame[..., :3], dtype=np.uint8)
+        height, width = frame.shape[:2]
+        for i in active:
+            start, _, sprite, x, y = self._items[i]
+            if callable(sprite):
+                sprite = sprite(t - start)
+            sprite_height, sprite_width = sprite.shape[:2]
+            if x == 'center':
+                x = (width - sprite_width) // 2
+
+            # Clip the sprite to the frame
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + sprite_width, width), min(y + sprite_height, height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            patch = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+            alpha = patch[..., 3:4].astype(np.uint16)
+            region = frame[y0:y1, x0:x1].astype(np.uint16)
+            frame[y0:y1, x0:x1] = ((patch[..., :3] * alpha + region * (255 - alpha) + 127) // 255).astype(np.uint8)
+        return frame
+
+    def apply(self, clip):
+        # The captioned clip, keeping the background's duration and audio
+        return clip.fl(lambda get_frame, t: self.blend(get_frame(t), t))
+
+
+scaled_sprite_cache = SpriteCache(SCALED_SPRITE_CACHE_MB)
+
+
+def scale_sprite(sprite: np.ndarray, scale: float) -> np.ndarray:
+    # Same size rounding as moviepy's resize
+    height, width = sprite.shape[:2]
+    size = (max(int(width * scale), 1), max(int(height * scale), 1))
+    if size == (width, height):
+        return sprite
+    return np.asarray(Image.fromarray(sprite).resize(size, Image.LANCZOS))
+
+
+class AnimationTable:
+    """A caption's scale animation, resampled lazily at the output frames it lands on.
+
+    scale_at(t) gives the scale at the caption's local time t. Sprites are
+    scaled for the local times the output frames land on, so looking one up
+    by frame index gives exactly what per-frame resizing would. A frame is
+    only resampled when it is first drawn, into its own bounded cache keyed
+    by base sprite and size, so identical words and repeated scale steps are
+    resampled once without evicting the base word sprites. The table keeps
+    only the frame it drew last and lets go of it after the caption's last
+    frame.
+    """
+
+    def __init__(self, sprite: np.ndarray, sprite_key: tuple, scale_at, duration: float, start: float, fps: float):
+        self.sprite = sprite
+        self.sprite_key = sprite_key
+        self.scale_at = scale_at
+        self.fps = fps
+        # Local time of the first output frame at or after start
+        self.phase = math.ceil(start * fps - 1e-6) / fps - start
+        self.count = max(int(math.ceil((duration - self.phase) * fps - 1e-6)), 1)
+        self._last = None  # (size, frame) drawn last
+
+    def __call__(self, t: float) -> np.ndarray:
+        n = min(max(int(round((t - self.phase) * self.fps)), 0), self.count - 1)
+        scale = self.scale_at(self.phase + n / self.fps)
+        height, width = self.sprite.shape[:2]
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+
+        if self._last is not None and self._last[0] == size:
+            frame = self._last[1]
+        elif size == (width, height):
+            frame = self.sprite
+        else:
+            frame = scaled_sprite_cache.get(("scaled", self.sprite_key, size), lambda: scale_sprite(self.sprite, scale))
+        self._last = (size, frame) if n < self.count - 1 else None
+        return frame
@@ -0,0 +1,103 @@
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Downloads run on one shared thread pool so parallelism stays bounded across
+# all jobs in the process, and every thread reuses the session's keep-alive
+# connections (up to POOL_SIZE_PER_HOST per host)
+MAX_PARALLEL_DOWNLOADS = int(os.getenv("MAX_PARALLEL_DOWNLOADS", "8"))
+POOL_SIZE_PER_HOST = int(os.getenv("DOWNLOAD_POOL_SIZE_PER_HOST", "8"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("DOWNLOAD_RETRY_BACKOFF_SECONDS", "0.5"))
+DOWNLOAD_TIMEOUT = (10, 120)
+
+# Bodies are streamed to disk CHUNK_SIZE bytes at a time, and a single job may
+# hold at most JOB_MAX_IN_FLIGHT_MB of downloaded data in memory at once
+CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+JOB_MAX_IN_FLIGHT_MB = float(os.getenv("DOWNLOAD_JOB_MAX_IN_FLIGHT_MB", "16"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ByteBudget:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self.total = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int):
+        with self._condition:
+            # Always let one chunk through so a small limit cannot deadlock
+            while self.in_flight and self.in_flight + size > self.limit:
+                self._condition.wait()
+            self.in_flight += size
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, size: int, used: int = 0):
+        with self._condition:
+            self.in_flight -= size
+            self.total += used
+            self._condition.notify_all()
+
+    def print_report(self):
+        print(f"Downloaded {self.total / (1024 * 1024):.1f} MB, peak in-flight {self.peak / (1024 * 1024):.1f} MB, "
+              f"peak RSS {peak_rss_mb():.0f} MB")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class DownloadManager:
+    def __init__(self, max_workers: int = MAX_PARALLEL_DOWNLOADS):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=POOL_SIZE_PER_HOST)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+
+    def _stream_to_file(self, url: str, path: str, budget: ByteBudget = None):
+        with self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+            with open(path, 'wb') as f:
+                while True:
+                    if budget is not None:
+                        budget.acquire(CHUNK_SIZE)
+                    chunk = b""
+                    try:
+                        chunk = next(chunks, b"")
+                        if chunk:
+                            f.write(chunk)
+                    finally:
+                        if budget is not None:
+                            budget.release(CHUNK_SIZE, len(chunk))
+                    if not chunk:
+                        break
+
+    def download(self, url: str, path: str, budget: ByteBudget = None) -> str:
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            try:
+                self._stream_to_file(url, path, budget)
+                return path
+            except requests.RequestException as e:
+                status = e.response.status_code if getattr(e, "response", None) is not None else None
+                if attempt == DOWNLOAD_RETRIES or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                delay = RETRY_BACKOFF_SECONDS * (2 ** attempt)
+                print(f"Download of {url} failed ({e}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+
+    def submit(self, url: str, path: str, budget: ByteBudget = None):
+        return self.executor.submit(self.download, url, path, budget)
+
+
+download_manager = DownloadManager()
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+
+from moviepy.config import get_setting
+
+# Same binary moviepy renders with, unless overridden
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY") or get_setting("FFMPEG_BINARY")
+
+# Intermediates are encoded near-lossless and fast, they only live for one job
+INTERMEDIATE_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "14", "-pix_fmt", "yuv420p"]
+
+
+def run_ffmpeg(args: list):
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + args
+    process = subprocess.run(cmd, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {process.stderr.decode(errors='ignore')[-1000:]}")
+
+
+def prescale_video(input_path: str, output_path: str, max_seconds: float = None, width: int = None, height: int = None) -> str:
+    # Trims to max_seconds and scales to the given width or height (keeping the
+    # aspect ratio) once, so the compositor does not resize every frame
+    scale = f"scale={width}:-2" if width else f"scale=-2:{height}"
+    args = ["-i", input_path]
+    if max_seconds is not None:
+        args += ["-t", f"{max_seconds:.3f}"]
+    run_ffmpeg(args + ["-vf", scale, "-an"] + INTERMEDIATE_ARGS + [output_path])
+    return output_path
+
+
+# imageio-ffmpeg only ships ffmpeg, so ffprobe has to come from the system
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+
+def probe_video(path: str) -> dict:
+    # Width, height, frame rate (as ffmpeg's rational string), codec and duration of the first video stream,
+    # plus the codec profile, level, time base and a hash of the extradata (SPS/PPS for H.264)
+    cmd = [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0", "-of", "json", "-show_data_hash", "sha256",
+           "-show_entries", "stream=codec_name,profile,level,width,height,r_frame_rate,time_base,pix_fmt,extradata_hash:format=duration", path]
+    process = subprocess.run(cmd, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {process.stderr.decode(errors='ignore')[-1000:]}")
+    info = json.loads(process.stdout)
+    stream = info["streams"][0]
+    numerator, denominator = stream["r_frame_rate"].split("/")
+    return {
+        "codec": stream["codec_name"],
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "pix_fmt": stream.get("pix_fmt"),
+        "profile": stream.get("profile"),
+        "level": stream.get("level"),
+        "time_base": stream.get("time_base"),
+        "extradata_hash": stream.get("extradata_hash"),
+        "frame_rate": stream["r_frame_rate"],
+        "fps": int(numerator) / int(denominator),
+        "duration": float(info["format"]["duration"])
+    }
+
+
+def probe_duration(path: str) -> float:
+    cmd = [FFPROBE_BINARY, "-v", "error", "-of", "default=noprint_wrappers=1:nokey=1", "-show_entries", "format=duration", path]
+    process = subprocess.run(cmd, capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {process.stderr.decode(errors='ignore')[-1000:]}")
+    return float(process.stdout.strip())
+
+
+def probe_keyframes(path: str, max_seconds: float = None) -> list:
+    # Presentation times of the video keyframes, read from packet flags without decoding
+    cmd = [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0", "-of", "csv=p=0", "-show_entries", "packet=pts_time,flags"]
+    if max_seconds is not None:
+        cmd += ["-read_intervals", f"%+{max_seconds:.3f}"]
+    process = subprocess.run(cmd + [path], capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {process.stderr.decode(errors='ignore')[-1000:]}")
+    keyframes = []
+    for line in process.stdout.decode().splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils.array_cache import ArrayCache
+from utils.video_processing import strip_url_params
+
+# Decoded, pre-scaled scene images shared across jobs, bounded by raster size
+MAX_MEMORY_MB = float(os.getenv("PRESCALED_IMAGE_CACHE_MB", "512"))
+
+
+class PrescaledImageCache(ArrayCache):
+    # Keyed by (normalized url, width), versioned by the identity of the cached source file
+    def __init__(self, max_memory_mb: float = MAX_MEMORY_MB):
+        super().__init__(max_memory_mb)
+
+    @staticmethod
+    def _identity(path: str) -> tuple:
+        # path comes from the asset cache, which revalidates the URL against the origin's ETag and
+        # replaces the file when it changed, so a new file means the image changed. The mtime is
+        # left out because the asset cache touches files on every hit.
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_size
+
+    def load(self, url: str, path: str, width: int) -> np.ndarray:
+        def decode():
+            with Image.open(path) as img:
+                img = img.convert("RGB")
+                # Same target size moviepy's resize(width=...) produces
+                height = int(img.size[1] * width / img.size[0])
+                return np.asarray(img.resize((width, height), Image.LANCZOS))
+
+        return self.get((strip_url_params(url), width), decode, version=self._identity(path))
+
+
+image_cache = PrescaledImageCache()
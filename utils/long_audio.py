@@ -0,0 +1,135 @@
+import asyncio
+import os
+from collections import deque
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE, load_audio
+from utils.transcription_executor import POOL_SIZE, QUEUE_DEPTH, run_transcription
+
+# Long audio is cut into roughly CHUNK_SECONDS pieces, each cut placed at the
+# quietest frame within SEARCH_SECONDS of the nominal boundary
+CHUNK_SECONDS = float(os.getenv("LONG_AUDIO_CHUNK_SECONDS", "120"))
+SEARCH_SECONDS = float(os.getenv("LONG_AUDIO_SEARCH_SECONDS", "5"))
+# Streaming uses Whisper-window sized chunks so the first words come back early
+STREAM_CHUNK_SECONDS = float(os.getenv("STREAM_CHUNK_SECONDS", "30"))
+FRAME_SECONDS = 0.02
+# Chunks of one file submitted to the executor at once, kept well under its queue
+# depth so a long file cannot fill the queue by itself
+MAX_CHUNKS_IN_FLIGHT = max(1, min(int(os.getenv("LONG_AUDIO_MAX_CHUNKS_IN_FLIGHT", str(POOL_SIZE * 2))), QUEUE_DEPTH // 2))
+
+
+def frame_energy(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    frame_length = int(sample_rate * frame_seconds)
+    frame_count = len(pcm) // frame_length
+    frames = pcm[:frame_count * frame_length].reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def find_split_points(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE, chunk_seconds: float = CHUNK_SECONDS, search_seconds: float = SEARCH_SECONDS) -> list:
+    duration = len(pcm) / sample_rate
+    if duration <= chunk_seconds + search_seconds:
+        return []
+
+    energy = frame_energy(pcm, sample_rate)
+    frame_length = int(sample_rate * FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+
+    split_points = []
+    for target in np.arange(chunk_seconds, duration - search_seconds, chunk_seconds):
+        center = int(target / FRAME_SECONDS)
+        lo = max(center - search_frames, 0)
+        hi = min(center + search_frames, len(energy))
+        split_points.append((lo + int(np.argmin(energy[lo:hi]))) * frame_length)
+    return split_points
+
+
+def split_audio(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE, chunk_seconds: float = CHUNK_SECONDS) -> list:
+    bounds = [0] + find_split_points(pcm, sample_rate, chunk_seconds) + [len(pcm)]
+    return [(start / sample_rate, pcm[start:end]) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def shift_segments(segments: list, offset: float, first_id: int = 0) -> list:
+    shifted = []
+    for segment in segments:
+        segment = dict(segment, id=first_id + len(shifted), start=round(segment['start'] + offset, 2), end=round(segment['end'] + offset, 2))
+        if 'words' in segment:
+            segment['words'] = [
+                dict(word, start=round(word['start'] + offset, 2), end=round(word['end'] + offset, 2))
+                for word in segment['words']
+            ]
+        shifted.append(segment)
+    return shifted
+
+
+def stitch_results(results: list, offsets: list) -> dict:
+    segments = []
+    for result, offset in zip(results, offsets):
+        segments.extend(shift_segments(result['segments'], offset, len(segments)))
+
+    return {
+        "text": "".join(result['text'] for result in results),
+        "segments": segments,
+        "language": results[0].get('language') if results else None
+    }
+
+
+async def transcribe_long_audio(audio, model_name: str, word_timestamps: bool = True, chunk_seconds: float = CHUNK_SECONDS, vad: bool = False) -> dict:
+    loop = asyncio.get_running_loop()
+    pcm = await loop.run_in_executor(None, load_audio, audio)
+    chunks = split_audio(pcm, SAMPLE_RATE, chunk_seconds)
+
+    semaphore = asyncio.Semaphore(MAX_CHUNKS_IN_FLIGHT)
+
+    async def transcribe_chunk(chunk):
+        async with semaphore:
+            return await run_transcription(chunk, model_name, vad=vad, word_timestamps=word_timestamps, fp16=False)
+
+    tasks = [asyncio.ensure_future(transcribe_chunk(chunk)) for _, chunk in chunks]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # On failure, chunks still waiting for the semaphore or the pool are not worth running
+        for task in tasks:
+            task.cancel()
+
+    result = stitch_results(results, [offset for offset, _ in chunks])
+    result["duration"] = len(pcm) / SAMPLE_RATE
+    result["chunks"] = len(chunks)
+    return result
+
+
+async def stream_transcription(audio, model_name: str, chunk_seconds: float = STREAM_CHUNK_SECONDS, vad: bool = False):
+    # Yields each chunk's segments, in timeline order, as soon as that chunk
+    # and all the ones before it are decoded
+    loop = asyncio.get_running_loop()
+    pcm = await loop.run_in_executor(None, load_audio, audio)
+    chunks = split_audio(pcm, SAMPLE_RATE, chunk_seconds)
+
+    # A sliding window of chunks is in the executor at once; the next chunk is
+    # submitted as soon as the oldest one is ready to be yielded
+    window = deque()
+    submitted = 0
+
+    def submit_next():
+        nonlocal submitted
+        offset, chunk = chunks[submitted]
+        submitted += 1
+        window.append((offset, asyncio.ensure_future(run_transcription(chunk, model_name, vad=vad, word_timestamps=True, fp16=False))))
+
+    try:
+        while submitted < len(chunks) and len(window) < MAX_CHUNKS_IN_FLIGHT:
+            submit_next()
+
+        segment_count = 0
+        while window:
+            offset, task = window.popleft()
+            result = await task
+            if submitted < len(chunks):
+                submit_next()
+            segments = shift_segments(result['segments'], offset, segment_count)
+            segment_count += len(segments)
+            yield {"text": result['text'], "segments": segments, "language": result.get('language'), "duration": len(pcm) / SAMPLE_RATE}
+    finally:
+        for _, task in window:
+            task.cancel()
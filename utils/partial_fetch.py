@@ -0,0 +1,228 @@
+import os
+import re
+import struct
+
+import numpy as np
+import requests
+
+from utils.download_manager import CHUNK_SIZE, DOWNLOAD_TIMEOUT, ByteBudget, download_manager
+
+# Partial fetching only pays off for ISO-BMFF files (mp4/mov) whose index can
+# be read up front. Anything else, or servers that ignore Range, fall back to
+# a full download.
+PARTIAL_FETCH_ENABLED = os.getenv("PARTIAL_FETCH", "1") == "1"
+PROBE_BYTES = 64 * 1024
+WINDOW_MARGIN_SECONDS = float(os.getenv("PARTIAL_FETCH_MARGIN_SECONDS", "1.0"))
+MAX_INDEX_BYTES = 64 * 1024 * 1024
+# Not worth the extra requests when most of the media data is needed anyway
+MAX_FETCH_RATIO = 0.8
+
+PARTIAL_EXTENSIONS = ('.mp4', '.mov', '.m4v')
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts"}
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+def _range_get(url: str, start: int, end: int):
+    response = download_manager.session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=DOWNLOAD_TIMEOUT, stream=True)
+    if response.status_code != 206:
+        response.close()
+        raise RangeNotSupported(f"Server answered {response.status_code} to a range request")
+    return response
+
+
+def _read_range(url: str, start: int, end: int):
+    with _range_get(url, start, end) as response:
+        total = None
+        match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+        if match:
+            total = int(match.group(1))
+        return response.content, total
+
+
+def _range_to_file(url: str, start: int, end: int, f, budget: ByteBudget = None):
+    with _range_get(url, start, end) as response:
+        f.seek(start)
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        while True:
+            if budget is not None:
+                budget.acquire(CHUNK_SIZE)
+            chunk = b""
+            try:
+                chunk = next(chunks, b"")
+                if chunk:
+                    f.write(chunk)
+            finally:
+                if budget is not None:
+                    budget.release(CHUNK_SIZE, len(chunk))
+            if not chunk:
+                break
+
+
+def _box_header(data: bytes, offset: int, end: int):
+    size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+    header_size = 8
+    if size == 1:
+        size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset
+    return box_type, size, header_size
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: int = None):
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        box_type, size, header_size = _box_header(data, offset, end)
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_boxes(data: bytes, path: list, start: int = 0, end: int = None) -> list:
+    found = []
+    for box_type, body_start, body_end in _iter_boxes(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            found.append((body_start, body_end))
+        elif box_type in CONTAINER_BOXES:
+            found.extend(_find_boxes(data, path[1:], body_start, body_end))
+    return found
+
+
+def _full_box(data: bytes, start: int):
+    # Returns (version, offset of the body after version/flags)
+    return data[start], start + 4
+
+
+def _track_byte_range(moov: bytes, trak: tuple, seconds: float):
+    mdhd = _find_boxes(moov, [b"mdia", b"mdhd"], *trak)
+    stbl = _find_boxes(moov, [b"mdia", b"minf", b"stbl"], *trak)
+    if not mdhd or not stbl:
+        return None
+    stbl_start, stbl_end = stbl[0]
+
+    version, body = _full_box(moov, mdhd[0][0])
+    timescale = struct.unpack(">I", moov[body + (16 if version == 1 else 8):][:4])[0]
+
+    def table(box_type):
+        boxes = _find_boxes(moov, [box_type], stbl_start, stbl_end)
+        return _full_box(moov, boxes[0][0])[1] if boxes else None
+
+    stts, stsc, stsz = table(b"stts"), table(b"stsc"), table(b"stsz")
+    stco, co64 = table(b"stco"), table(b"co64")
+    if stts is None or stsc is None or stsz is None or (stco is None and co64 is None):
+        return None
+
+    count = struct.unpack(">I", moov[stts:stts + 4])[0]
+    stts_entries = np.frombuffer(moov, dtype=">u4", count=count * 2, offset=stts + 4).reshape(-1, 2).astype(np.int64)
+    durations = np.repeat(stts_entries[:, 1], stts_entries[:, 0])
+    decode_times = np.concatenate(([0], np.cumsum(durations)[:-1]))
+    needed_samples = max(int(np.searchsorted(decode_times, seconds * timescale, side="right")), 1)
+
+    sample_size, sample_count = struct.unpack(">II", moov[stsz:stsz + 8])
+    if sample_size:
+        sizes = np.full(sample_count, sample_size, dtype=np.int64)
+    else:
+        sizes = np.frombuffer(moov, dtype=">u4", count=sample_count, offset=stsz + 8).astype(np.int64)
+
+    if co64 is not None:
+        count = struct.unpack(">I", moov[co64:co64 + 4])[0]
+        chunk_offsets = np.frombuffer(moov, dtype=">u8", count=count, offset=co64 + 4).astype(np.int64)
+    else:
+        count = struct.unpack(">I", moov[stco:stco + 4])[0]
+        chunk_offsets = np.frombuffer(moov, dtype=">u4", count=count, offset=stco + 4).astype(np.int64)
+
+    count = struct.unpack(">I", moov[stsc:stsc + 4])[0]
+    stsc_entries = np.frombuffer(moov, dtype=">u4", count=count * 3, offset=stsc + 4).reshape(-1, 3).astype(np.int64)
+    # Expand the run-length stsc table into samples-per-chunk for every chunk
+    first_chunks = np.append(stsc_entries[:, 0], len(chunk_offsets) + 1)
+    samples_per_chunk = np.repeat(stsc_entries[:, 1], np.diff(first_chunks))
+    chunk_first_sample = np.concatenate(([0], np.cumsum(samples_per_chunk)))
+
+    needed_samples = min(needed_samples, len(sizes))
+    if needed_samples == 0 or len(chunk_offsets) == 0:
+        return None
+    last_chunk = min(int(np.searchsorted(chunk_first_sample, needed_samples - 1, side="right")) - 1, len(chunk_offsets) - 1)
+    chunk_end = chunk_offsets[last_chunk] + sizes[chunk_first_sample[last_chunk]:chunk_first_sample[last_chunk + 1]].sum()
+    return int(chunk_offsets[0]), int(chunk_end)
+
+
+def _top_level_boxes(url: str):
+    probe, total_size = _read_range(url, 0, PROBE_BYTES - 1)
+    if total_size is None:
+        raise RangeNotSupported("No total size in Content-Range")
+
+    boxes = []
+    offset = 0
+    while offset < total_size:
+        if offset + 16 <= len(probe):
+            header = probe[offset:offset + 16]
+        else:
+            header, _ = _read_range(url, offset, min(offset + 15, total_size - 1))
+        if len(header) < 8:
+            break
+        box_type, size, header_size = _box_header(header.ljust(16, b"\0"), 0, total_size - offset)
+        if size < header_size:
+            break
+        boxes.append((box_type, offset, offset + size))
+        offset += size
+    return boxes, total_size
+
+
+def fetch_time_window(url: str, path: str, seconds: float, budget: ByteBudget = None) -> bool:
+    """Fetch just enough of an mp4/mov at url to decode its first `seconds`.
+
+    Writes a sparse file of the original size to path, holding every
+    top-level box except mdat plus the part of mdat covering the window.
+    Returns False, leaving path untouched, when a full download is needed.
+    """
+    if not PARTIAL_FETCH_ENABLED or not url.split('?')[0].lower().endswith(PARTIAL_EXTENSIONS):
+        return False
+
+    try:
+        boxes, total_size = _top_level_boxes(url)
+        box_types = [box_type for box_type, _, _ in boxes]
+        if b"moov" not in box_types or b"mdat" not in box_types or b"moof" in box_types:
+            return False
+
+        index_boxes = [(start, end) for box_type, start, end in boxes if box_type != b"mdat"]
+        if sum(end - start for start, end in index_boxes) > MAX_INDEX_BYTES:
+            return False
+
+        _, moov_start, moov_end = next(box for box in boxes if box[0] == b"moov")
+        moov, _ = _read_range(url, moov_start, moov_end - 1)
+        moov_body = _box_header(moov, 0, len(moov))[2]
+
+        track_ranges = [
+            _track_byte_range(moov, trak, seconds + WINDOW_MARGIN_SECONDS)
+            for trak in _find_boxes(moov, [b"trak"], moov_body)
+        ]
+        if not track_ranges or None in track_ranges:
+            return False
+        data_start = min(start for start, _ in track_ranges)
+        data_end = max(end for _, end in track_ranges)
+
+        mdat_size = sum(end - start for box_type, start, end in boxes if box_type == b"mdat")
+        if data_end - data_start > MAX_FETCH_RATIO * mdat_size:
+            return False
+
+        with open(path, "wb") as f:
+            f.truncate(total_size)
+            for start, end in index_boxes:
+                _range_to_file(url, start, end - 1, f, budget)
+            _range_to_file(url, data_start, data_end - 1, f, budget)
+
+        print(f"Partially fetched {url.split('?')[0]}: {(data_end - data_start) / (1024 * 1024):.1f} of "
+              f"{total_size / (1024 * 1024):.1f} MB for the first {seconds:.1f} seconds")
+        return True
+    except (RangeNotSupported, requests.RequestException, struct.error, ValueError, IndexError, StopIteration) as e:
+        print(f"Partial fetch of {url.split('?')[0]} not possible ({e}), falling back to a full download")
+        if os.path.exists(path):
+            os.remove(path)
+        return False
@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+
+# Bounded hand-off queues keep a fast stage from running far ahead of a slow one
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+_DONE = object()
+
+
+class Stage:
+    # With an executor, the stage's workers hand each item to that shared pool and wait for it,
+    # so workers bounds this pipeline's items in flight while the pool bounds the whole process
+    def __init__(self, name: str, fn, workers: int = 1, executor=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.executor = executor
+        self.busy_seconds = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.busy_seconds += seconds
+            self.items += 1
+
+
+class PipelineStats:
+    def __init__(self):
+        self.start_time = time.time()
+        self.stages = []  # (name, workers, busy_seconds, items)
+
+    def add(self, name: str, workers: int, busy_seconds: float, items: int):
+        self.stages.append((name, workers, busy_seconds, items))
+
+    def report(self) -> dict:
+        wall = time.time() - self.start_time
+        return {
+            "wall_seconds": round(wall, 2),
+            "stages": [
+                {
+                    "stage": name,
+                    "workers": workers,
+                    "items": items,
+                    "busy_seconds": round(busy, 2),
+                    "utilization": round(busy / (wall * workers), 3) if wall else 0.0
+                }
+                for name, workers, busy, items in self.stages
+            ]
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"Pipeline finished in {report['wall_seconds']} seconds")
+        for stage in report['stages']:
+            print(f"  {stage['stage']:<10} {stage['items']:>4} items  busy {stage['busy_seconds']:>8.2f}s  "
+                  f"utilization {stage['utilization'] * 100:5.1f}% of {stage['workers']} worker(s)")
+
+
+def run_pipeline(items: list, stages: list, stats: PipelineStats = None, queue_size: int = QUEUE_SIZE) -> list:
+    """Push items through stages, each stage running on its own worker threads.
+
+    Item i+1 can be in an earlier stage while item i is in a later one.
+    Returns the last stage's outputs in input order; the first error raised
+    by any stage is re-raised once the pipeline has drained.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    results = [None] * len(items)
+    errors = []
+
+    def worker(stage_index: int, remaining: list):
+        stage = stages[stage_index]
+        while True:
+            entry = queues[stage_index].get()
+            if entry is _DONE:
+                break
+            index, value = entry
+            if not errors:
+                try:
+                    started = time.time()
+                    if stage.executor is None:
+                        value = stage.fn(value)
+                    else:
+                        value = stage.executor.submit(stage.fn, value).result()
+                    stage.record(time.time() - started)
+                except Exception as e:
+                    errors.append(e)
+            if stage_index + 1 < len(stages):
+                queues[stage_index + 1].put((index, value))
+            else:
+                results[index] = value
+
+        # The last worker of a stage to finish tells every worker of the next stage to stop
+        with stage._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and stage_index + 1 < len(stages):
+            for _ in range(stages[stage_index + 1].workers):
+                queues[stage_index + 1].put(_DONE)
+
+    threads = []
+    for stage_index, stage in enumerate(stages):
+        remaining = [stage.workers]
+        for _ in range(stage.workers):
+            thread = threading.Thread(target=worker, args=(stage_index, remaining), name=f"pipeline-{stage.name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    for index, item in enumerate(items):
+        queues[0].put((index, item))
+    for _ in range(stages[0].workers):
+        queues[0].put(_DONE)
+
+    for thread in threads:
+        thread.join()
+
+    if stats is not None:
+        for stage in stages:
+            stats.add(stage.name, stage.workers, stage.busy_seconds, stage.items)
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,99 @@
+import os
+
+# Named x264/aac encoder settings for the final render. None means the
+# encoder's (or the caller's) default. "default" keeps moviepy's behaviour.
+CPU_COUNT = os.cpu_count() or 1
+
+PROFILES = {
+    "default": {"preset": "medium", "crf": None, "bitrate": None, "maxrate": None, "bufsize": None,
+                "threads": None, "tune": None, "pix_fmt": None, "fps": None, "audio_bitrate": None},
+    "draft": {"preset": "ultrafast", "crf": 30, "bitrate": None, "maxrate": None, "bufsize": None,
+              "threads": CPU_COUNT, "tune": "fastdecode", "pix_fmt": "yuv420p", "fps": 24, "audio_bitrate": "96k"},
+    "fast": {"preset": "veryfast", "crf": 23, "bitrate": None, "maxrate": None, "bufsize": None,
+             "threads": CPU_COUNT, "tune": None, "pix_fmt": "yuv420p", "fps": 30, "audio_bitrate": "128k"},
+    "balanced": {"preset": "medium", "crf": 20, "bitrate": None, "maxrate": None, "bufsize": None,
+                 "threads": CPU_COUNT, "tune": None, "pix_fmt": "yuv420p", "fps": 30, "audio_bitrate": "160k"},
+    "quality": {"preset": "slow", "crf": 17, "bitrate": None, "maxrate": None, "bufsize": None,
+                "threads": CPU_COUNT, "tune": "film", "pix_fmt": "yuv420p", "fps": None, "audio_bitrate": "192k"},
+    # 10 Mbit/s average, within YouTube's recommended range for 1080p uploads, with peaks capped
+    # by the VBV buffer so the rate stays close to constant
+    "youtube": {"preset": "medium", "crf": None, "bitrate": "10M", "maxrate": "12M", "bufsize": "20M",
+                "threads": CPU_COUNT, "tune": None, "pix_fmt": "yuv420p", "fps": 30, "audio_bitrate": "192k"}
+}
+
+# RENDER_PROFILE sets the default for every endpoint, RENDER_PROFILE_<ENDPOINT>
+# (e.g. RENDER_PROFILE_CAPTIONED_V2) overrides it for one endpoint
+DEFAULT_PROFILE = os.getenv("RENDER_PROFILE", "default")
+
+
+def validate_profile_name(name: str):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown render profile '{name}', expected one of {sorted(PROFILES)}")
+
+
+def resolve_profile(name: str = None, endpoint: str = None) -> str:
+    # Request value first, then the endpoint's configured profile, then the global default
+    if not name and endpoint:
+        name = os.getenv(f"RENDER_PROFILE_{endpoint.upper()}")
+    name = name or DEFAULT_PROFILE
+    validate_profile_name(name)
+    return name
+
+
+def sets_rate_control(name: str) -> bool:
+    # Whether the profile chooses the video quality or bitrate itself, which a stream copy cannot honour
+    profile = PROFILES[name]
+    return profile["crf"] is not None or bool(profile["bitrate"]) or bool(profile["maxrate"])
+
+
+def write_videofile_args(name: str, fps: float = None) -> dict:
+    # Keyword arguments for moviepy's write_videofile; fps is the caller's
+    # frame rate when the profile does not set one
+    profile = PROFILES[name]
+    ffmpeg_params = []
+    if profile["crf"] is not None:
+        ffmpeg_params += ["-crf", str(profile["crf"])]
+    if profile["tune"]:
+        ffmpeg_params += ["-tune", profile["tune"]]
+    if profile["pix_fmt"]:
+        ffmpeg_params += ["-pix_fmt", profile["pix_fmt"]]
+    if profile["maxrate"]:
+        ffmpeg_params += ["-maxrate", profile["maxrate"], "-bufsize", profile["bufsize"]]
+    return {
+        "codec": "libx264",
+        "audio_codec": "aac",
+        "preset": profile["preset"],
+        "bitrate": profile["bitrate"],
+        "threads": profile["threads"],
+        "fps": profile["fps"] or fps,
+        "audio_bitrate": profile["audio_bitrate"],
+        "ffmpeg_params": ffmpeg_params or None
+    }
+
+
+def ffmpeg_args(name: str) -> list:
+    # The same settings as output options for a plain ffmpeg command line
+    profile = PROFILES[name]
+    args = ["-c:v", "libx264", "-preset", profile["preset"]]
+    if profile["crf"] is not None:
+        args += ["-crf", str(profile["crf"])]
+    if profile["bitrate"]:
+        args += ["-b:v", profile["bitrate"]]
+    if profile["maxrate"]:
+        args += ["-maxrate", profile["maxrate"], "-bufsize", profile["bufsize"]]
+    if profile["tune"]:
+        args += ["-tune", profile["tune"]]
+    if profile["threads"]:
+        args += ["-threads", str(profile["threads"])]
+    args += ["-pix_fmt", profile["pix_fmt"] or "yuv420p"]
+    if profile["fps"]:
+        args += ["-r", str(profile["fps"])]
+    return args + audio_ffmpeg_args(name)
+
+
+def audio_ffmpeg_args(name: str) -> list:
+    profile = PROFILES[name]
+    args = ["-c:a", "aac", "-ar", "44100"]
+    if profile["audio_bitrate"]:
+        args += ["-b:a", profile["audio_bitrate"]]
+    return args
@@ -0,0 +1,46 @@
+import numpy as np
+
+LINE_BREAK_CHARS = ('.', '?', ',')
+
+
+def line_ids(words: list, max_words: int = 3, break_chars: tuple = LINE_BREAK_CHARS) -> np.ndarray:
+    # Line number of every word: a line ends after max_words words or after a word with punctuation
+    ids = np.empty(len(words), dtype=np.int64)
+    line = 0
+    count = 0
+    for i, word in enumerate(words):
+        ids[i] = line
+        count += 1
+        if count == max_words or any(char in word for char in break_chars):
+            line += 1
+            count = 0
+    return ids
+
+
+def layout_caption_lines(captions: list, widths: list, space_width: int, frame_width: int, max_words: int = 3) -> dict:
+    """Group caption words into centered lines and place every word, for the whole caption list at once.
+
+    widths are the rendered word widths in pixels. Returns per-word arrays
+    "line", "x" and "clear_time" (when the word's line is cleared), and
+    per-line arrays "line_start" (index of its first word) and "line_end".
+    """
+    if not captions:
+        empty = np.zeros(0, dtype=np.int64)
+        return {"line": empty, "x": empty, "clear_time": np.zeros(0), "line_start": empty, "line_end": np.zeros(0)}
+
+    ids = line_ids([caption['word'] for caption in captions], max_words)
+    widths = np.asarray(widths, dtype=np.int64)
+    ends = np.array([caption['end'] for caption in captions], dtype=float)
+
+    line_start = np.flatnonzero(np.diff(ids, prepend=-1))
+    words_per_line = np.diff(np.append(line_start, len(captions)))
+    line_width = np.add.reduceat(widths, line_start) + space_width * (words_per_line - 1)
+    line_x = (frame_width - line_width) // 2  # Center the total width
+
+    # Each word starts after the widths and spaces of the words before it on its line
+    advance = widths + space_width
+    before = np.cumsum(advance) - advance
+    x = line_x[ids] + before - before[line_start][ids]
+
+    line_end = np.maximum(np.maximum.reduceat(ends, line_start), 0)
+    return {"line": ids, "x": x, "clear_time": line_end[ids], "line_start": line_start, "line_end": line_end}
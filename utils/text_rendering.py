@@ -0,0 +1,155 @@
+import functools
+import math
+import os
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from utils.array_cache import ArrayCache
+
+# Captions are rasterized in-process with Pillow/FreeType instead of moviepy's
+# TextClip, which runs ImageMagick and writes a temp PNG for every call
+FONT_CACHE_SIZE = int(os.getenv("FONT_CACHE_SIZE", "64"))
+# Rendered word sprites shared across jobs, bounded by raster size
+SPRITE_CACHE_MB = float(os.getenv("SPRITE_CACHE_MB", "256"))
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(font_path: str, fontsize: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_path, fontsize)
+
+
+def parse_color(color) -> tuple:
+    # Accepts the color strings TextClip did ("white", "rgb(206, 202, 198)", "#fff", "transparent") or an RGB(A) tuple
+    if color is None or color == 'transparent':
+        return (0, 0, 0, 0)
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    return tuple(color) + (255,) * (4 - len(color))
+
+
+class FontMetrics:
+    # Glyph advances and kerning pairs of one font at one size, read from the font
+    # once and then looked up, so strings are measured without rasterizing them
+    PRELOADED = [chr(code) for code in range(32, 256)]
+
+    def __init__(self, font: ImageFont.FreeTypeFont):
+        self.font = font
+        ascent, descent = font.getmetrics()
+        self.line_height = ascent + descent
+        self._advances = {}
+        self._rights = {}  # advance, or the ink's right edge when the glyph overhangs it
+        self._overhangs = {}  # how far the ink reaches left of the glyph origin
+        self._pairs = {}
+        for char in self.PRELOADED:
+            self._glyph(char)
+
+    def _glyph(self, char: str) -> float:
+        advance = self._advances.get(char)
+        if advance is None:
+            advance = self.font.getlength(char)
+            ink_left, _, ink_right, _ = self.font.getbbox(char) if char.strip() else (0, 0, 0, 0)
+            self._rights[char] = max(advance, ink_right)
+            self._overhangs[char] = max(-ink_left, 0)
+            self._advances[char] = advance
+        return advance
+
+    def pair_kerning(self, left: str, right: str) -> float:
+        pair = left + right
+        kerning = self._pairs.get(pair)
+        if kerning is None:
+            kerning = self.font.getlength(pair) - self._glyph(left) - self._glyph(right)
+            self._pairs[pair] = kerning
+        return kerning
+
+    def offsets(self, text: str, kerning: float = 0) -> np.ndarray:
+        # x offset of every character; kerning adds extra spacing between characters like ImageMagick's -kerning
+        if not text:
+            return np.zeros(0)
+        steps = [self._glyph(left) + self.pair_kerning(left, right) + kerning for left, right in zip(text, text[1:])]
+        return np.concatenate(([0.0], np.cumsum(steps)))
+
+    def left_overhang(self, text: str) -> float:
+        if not text:
+            return 0.0
+        self._glyph(text[0])
+        return self._overhangs[text[0]]
+
+    def text_width(self, text: str, kerning: float = 0) -> float:
+        # Ink extent including a first glyph that reaches left of the origin (like "j")
+        if not text:
+            return 0.0
+        self._glyph(text[-1])
+        return self.left_overhang(text) + float(self.offsets(text, kerning)[-1]) + self._rights[text[-1]]
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def font_metrics(font_path: str, fontsize: int) -> FontMetrics:
+    return FontMetrics(load_font(font_path, fontsize))
+
+
+def _stroke_pixels(stroke_color, stroke_width: float) -> int:
+    # As in ImageMagick the stroke is centered on the glyph outline, so half of it shows outside the glyphs
+    return int(math.ceil(stroke_width / 2)) if stroke_color and parse_color(stroke_color)[3] else 0
+
+
+def sprite_size(text: str, font_path: str, fontsize: int, stroke_color=None, stroke_width: float = 0, kerning: float = 0) -> tuple:
+    # (width, height) of the array render_text returns for the same arguments, computed from metrics alone
+    metrics = font_metrics(font_path, fontsize)
+    stroke = _stroke_pixels(stroke_color, stroke_width)
+    width = int(math.ceil(metrics.text_width(text, kerning))) + 2 * stroke
+    return max(width, 1), metrics.line_height + 2 * stroke
+
+
+def _draw(text: str, font: ImageFont.FreeTypeFont, size: tuple, origin: tuple, offsets: list, fill: tuple, stroke: int, stroke_fill: tuple) -> Image.Image:
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    if offsets is None:
+        draw.text(origin, text, font=font, fill=fill, stroke_width=stroke, stroke_fill=stroke_fill)
+    else:
+        for char, offset in zip(text, offsets):
+            draw.text((origin[0] + offset, origin[1]), char, font=font, fill=fill, stroke_width=stroke, stroke_fill=stroke_fill)
+    return image
+
+
+def render_text(text: str, font_path: str, fontsize: int, color='white', stroke_color=None, stroke_width: float = 0, kerning: float = 0) -> np.ndarray:
+    """Rasterize one line of text to an RGBA uint8 array.
+
+    Follows TextClip's label layout: the canvas is one font line high
+    (ascent + descent) and as wide as the text, grown by the stroke. As in
+    ImageMagick the stroke is centered on the glyph outline, so half of
+    stroke_width shows outside the glyphs. A transparent fill leaves only
+    the outline. The size always equals sprite_size for the same arguments.
+    """
+    font = load_font(font_path, fontsize)
+    fill = parse_color(color)
+    stroke_fill = parse_color(stroke_color)
+    stroke = _stroke_pixels(stroke_color, stroke_width)
+    offsets = font_metrics(font_path, fontsize).offsets(text, kerning) if kerning and len(text) > 1 else None
+    size = sprite_size(text, font_path, fontsize, stroke_color, stroke_width, kerning)
+    origin = (stroke + math.ceil(font_metrics(font_path, fontsize).left_overhang(text)), stroke)
+
+    if fill[3]:
+        image = _draw(text, font, size, origin, offsets, fill, stroke, stroke_fill)
+        return np.asarray(image)
+
+    # Transparent fill: keep the stroke and cut the glyph bodies out of it
+    outline = np.array(_draw(text, font, size, origin, offsets, stroke_fill, stroke, stroke_fill))
+    body = np.asarray(_draw(text, font, size, origin, offsets, (0, 0, 0, 255), 0, None))
+    outline[..., 3] = (outline[..., 3].astype(np.uint16) * (255 - body[..., 3]) // 255).astype(np.uint8)
+    return outline
+
+
+class SpriteCache(ArrayCache):
+    # Word sprites keyed by (text, font, size, color, stroke color, stroke width, kerning)
+    def __init__(self, max_memory_mb: float = SPRITE_CACHE_MB):
+        super().__init__(max_memory_mb)
+
+    def render(self, text: str, font_path: str, fontsize: int, color='white', stroke_color=None, stroke_width: float = 0, kerning: float = 0) -> np.ndarray:
+        # Same arguments and result as render_text, the array must not be modified
+        key = (text, font_path, fontsize, color, stroke_color, stroke_width, kerning)
+        return self.get(key, lambda: render_text(*key))
+
+
+sprite_cache = SpriteCache()
+
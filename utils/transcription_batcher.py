@@ -0,0 +1,269 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from utils.audio_decoding import SAMPLE_RATE, load_audio
+from utils.transcription_executor import run_transcription, submit
+from utils.vad import compress_speech, remap_result
+from utils.whisper_models import get_model
+
+# Requests for the same model that arrive within MAX_WAIT_MS of each other are
+# decoded together, up to MAX_BATCH_SIZE at a time
+MAX_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_MAX_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("WHISPER_BATCH_MAX_WAIT_MS", "50"))
+
+PREPEND_PUNCTUATIONS = "\"'“¿([{-"
+APPEND_PUNCTUATIONS = "\"'.。,，!！?？:：”)]}、"
+
+# model.transcribe's defaults: a greedy decode that looks repetitive or unlikely is
+# retried at higher temperatures, and one that is likely silence is dropped
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+def _window_segments(tokenizer, tokens: list, duration: float, result):
+    # Cuts one decoded window into segments at its timestamp tokens, as model.transcribe does.
+    # Returns None when the window stops inside a segment, which model.transcribe would finish
+    # by decoding again from the last timestamp.
+    from whisper.audio import HOP_LENGTH
+
+    time_precision = 2 * HOP_LENGTH / SAMPLE_RATE
+    begin = tokenizer.timestamp_begin
+    is_timestamp = [token >= begin for token in tokens]
+    cuts = [k + 1 for k in range(len(tokens) - 1) if is_timestamp[k] and is_timestamp[k + 1]]
+
+    if cuts:
+        if is_timestamp[-2:] == [False, True]:
+            cuts.append(len(tokens))
+        if any(token < tokenizer.eot for token in tokens[cuts[-1]:]):
+            return None
+        pieces = []
+        last = 0
+        for cut in cuts:
+            piece = tokens[last:cut]
+            pieces.append(((piece[0] - begin) * time_precision, (piece[-1] - begin) * time_precision, piece))
+            last = cut
+    else:
+        end = duration
+        timestamps = [token for token in tokens if token >= begin]
+        if timestamps and timestamps[-1] != begin:
+            end = (timestamps[-1] - begin) * time_precision
+        pieces = [(0.0, end, tokens)]
+
+    # Empty or zero-length segments are dropped, like model.transcribe does
+    pieces = [
+        (start, end, piece) for start, end, piece in pieces
+        if start != end and tokenizer.decode([token for token in piece if token < tokenizer.eot]).strip()
+    ]
+    return [
+        {
+            "id": i,
+            "seek": 0,
+            "start": start,
+            "end": end,
+            "text": tokenizer.decode([token for token in piece if token < tokenizer.eot]),
+            "tokens": piece,
+            "temperature": 0.0,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob
+        }
+        for i, (start, end, piece) in enumerate(pieces)
+    ]
+
+
+def _finish_clip(model, mel, pcm, result) -> dict:
+    # Segments and word timings of one clip's greedy decode, or model.transcribe's result when it needs a retry
+    from whisper.audio import HOP_LENGTH
+    from whisper.timing import add_word_timestamps
+    from whisper.tokenizer import get_tokenizer
+
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return {"text": "", "segments": [], "language": result.language}
+
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=model.num_languages,
+        language=result.language,
+        task="transcribe"
+    )
+    segments = None
+    if result.compression_ratio <= COMPRESSION_RATIO_THRESHOLD and result.avg_logprob >= LOGPROB_THRESHOLD:
+        segments = _window_segments(tokenizer, result.tokens, len(pcm) / SAMPLE_RATE, result)
+    if segments is None:
+        # The clip gets model.transcribe's temperature fallback on its own
+        return model.transcribe(pcm, word_timestamps=True, fp16=False)
+
+    add_word_timestamps(
+        segments=segments,
+        model=model,
+        tokenizer=tokenizer,
+        mel=mel,
+        num_frames=len(pcm) // HOP_LENGTH,
+        prepend_punctuations=PREPEND_PUNCTUATIONS,
+        append_punctuations=APPEND_PUNCTUATIONS,
+        last_speech_timestamp=0.0
+    )
+    return {
+        "text": tokenizer.decode([token for segment in segments for token in segment["tokens"] if token < tokenizer.eot]),
+        "language": result.language,
+        "segments": segments
+    }
+
+
+def _transcribe_batch(audios: list, model_name: str, vad_flags: list) -> list:
+    """Transcribe the short clips of a batch with one batched decode.
+
+    Every item gets its own entry: a result dict, the exception that item
+    raised, or, for a clip longer than one 30 second window, its decoded
+    audio, which the caller transcribes on its own instead of holding the
+    rest of the batch up behind Whisper's sliding decode.
+    """
+    import torch
+    import whisper
+    from whisper.audio import N_SAMPLES
+
+    model = get_model(model_name)
+    results = [None] * len(audios)
+    originals, samples, mappings = {}, {}, {}
+    for i, (audio, vad) in enumerate(zip(audios, vad_flags)):
+        # A body that does not decode fails its own request, not the whole batch
+        try:
+            pcm = load_audio(audio)
+            speech, mapping = compress_speech(pcm) if vad else (pcm, None)
+        except Exception as e:
+            results[i] = e
+            continue
+        if len(speech) > N_SAMPLES:
+            results[i] = pcm
+        elif len(speech) == 0:
+            results[i] = {"text": "", "segments": [], "language": None}
+            originals[i] = pcm
+        else:
+            originals[i], samples[i], mappings[i] = pcm, speech, mapping
+
+    short = list(samples)
+    if short:
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(samples[i]), model.dims.n_mels)
+            for i in short
+        ]).to(model.device)
+        language = None if model.is_multilingual else "en"
+        options = whisper.DecodingOptions(language=language, temperature=0.0, fp16=False)
+
+        # One encoder pass and one batched greedy decode for every short clip
+        decoded = whisper.decode(model, mels, options)
+
+        for mel, i, result in zip(mels, short, decoded):
+            try:
+                results[i] = _finish_clip(model, mel, samples[i], result)
+            except Exception as e:
+                results[i] = e
+
+    for i, pcm in originals.items():
+        if not isinstance(results[i], dict):
+            continue
+        if mappings.get(i) is not None:
+            results[i] = remap_result(results[i], mappings[i])
+        results[i]["duration"] = len(pcm) / SAMPLE_RATE
+
+    return results
+
+
+class TranscriptionBatcher:
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = deque(maxlen=200)
+        self._pending = {}  # model name -> [(audio, vad, future, enqueued_at)]
+        self._timers = {}
+        self._running = set()  # batch tasks, referenced until they finish
+
+    async def transcribe(self, audio, model_name: str, vad: bool = False) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(model_name, [])
+        pending.append((audio, vad, future, time.time()))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(model_name)
+        elif len(pending) == 1:
+            self._timers[model_name] = loop.call_later(self.max_wait, self._flush, model_name)
+
+        return await future
+
+    def _flush(self, model_name: str):
+        timer = self._timers.pop(model_name, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model_name, [])
+        if batch:
+            self._spawn(self._run(model_name, batch))
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, model_name: str, batch: list):
+        flushed_at = time.time()
+        try:
+            results = await submit(_transcribe_batch, [item[0] for item in batch], model_name, [item[1] for item in batch])
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        finished_at = time.time()
+        stats = {
+            "model": model_name,
+            "batch_size": len(batch),
+            "max_queue_wait_ms": round((flushed_at - batch[0][3]) * 1000, 1),
+            "decode_seconds": round(finished_at - flushed_at, 3),
+            "finished_at": finished_at
+        }
+        self.stats.append(stats)
+        print(f"Transcribed batch of {stats['batch_size']} in {stats['decode_seconds']}s "
+              f"(waited {stats['max_queue_wait_ms']} ms)")
+
+        for (_, vad, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif isinstance(result, dict):
+                result["batch"] = stats
+                future.set_result(result)
+            else:
+                # Too long to batch, transcribed on its own from the audio decoded above
+                self._spawn(self._run_alone(model_name, result, vad, future, stats))
+
+    async def _run_alone(self, model_name: str, pcm, vad: bool, future, stats: dict):
+        try:
+            result = await run_transcription(pcm, model_name, vad=vad, word_timestamps=True, fp16=False)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        result["batch"] = dict(stats, batch_size=1)
+        if not future.done():
+            future.set_result(result)
+
+    def summary(self) -> dict:
+        batches = list(self.stats)
+        requests = sum(s["batch_size"] for s in batches)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": len(batches),
+            "requests": requests,
+            "mean_batch_size": round(requests / len(batches), 2) if batches else 0,
+            "mean_decode_seconds": round(sum(s["decode_seconds"] for s in batches) / len(batches), 3) if batches else 0,
+            "recent": batches[-10:]
+        }
+
+
+batcher = TranscriptionBatcher()
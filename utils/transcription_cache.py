@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR", "TranscriptionCache")
+MAX_DISK_MB = float(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", "512"))
+MEMORY_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MEMORY_ENTRIES", "256"))
+# Once the directory goes over budget it is trimmed to this fraction of it, so a full
+# cache is not rescanned on every write
+EVICT_TARGET = 0.9
+
+
+def cache_key(audio_bytes: bytes, model_name: str, word_timestamps: bool, vad: bool = False) -> str:
+    digest = hashlib.sha256(audio_bytes).hexdigest()
+    key = f"{digest}_{model_name}_{'words' if word_timestamps else 'text'}"
+    return f"{key}_vad" if vad else key
+
+
+class TranscriptionCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, max_disk_mb: float = MAX_DISK_MB, memory_entries: int = MEMORY_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+        # Entries are written to disk on one background thread, off the caller's event loop
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcription-cache")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key: str, result: dict):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _from_memory(self, keys: list):
+        with self._lock:
+            for key in keys:
+                result = self._memory.get(key)
+                if result is not None:
+                    self._memory.move_to_end(key)
+                    return result
+        return None
+
+    def _from_disk(self, keys: list):
+        # Reads without holding the lock; an entry evicted meanwhile is just a miss
+        for key in keys:
+            path = self._path(key)
+            try:
+                with open(path) as f:
+                    result = json.load(f)
+                # Access time drives disk eviction order
+                os.utime(path)
+            except (OSError, ValueError):
+                continue
+            with self._lock:
+                self._remember(key, result)
+            return result
+        return None
+
+    def _count(self, result):
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def get(self, key: str):
+        return self.get_first([key])
+
+    def get_first(self, keys: list):
+        # The entry of the first key that is cached, counted as a single hit or miss
+        result = self._from_memory(keys)
+        if result is None:
+            result = self._from_disk(keys)
+        return self._count(result)
+
+    async def get_async(self, key: str):
+        return await self.get_first_async([key])
+
+    async def get_first_async(self, keys: list):
+        # get_first for request handlers: memory hits return directly, disk reads run off the event loop
+        result = self._from_memory(keys)
+        if result is None:
+            result = await asyncio.get_running_loop().run_in_executor(None, self._from_disk, keys)
+        return self._count(result)
+
+    def put(self, key: str, result: dict):
+        with self._lock:
+            self._remember(key, result)
+        self._writer.submit(self._write, key, result)
+
+    def _write(self, key: str, result: dict):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(result, f)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not write transcription cache entry {key}: {e}")
+            return
+
+        # The directory size is tracked as entries are written, it is only listed to evict.
+        # Only the writer thread touches it, so neither needs the lock readers use.
+        self._disk_bytes += size - old_size
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _disk_entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict_disk(self):
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes * EVICT_TARGET:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory)
+        }
+
+
+transcription_cache = TranscriptionCache()
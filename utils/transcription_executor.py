@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.audio_decoding import SAMPLE_RATE, load_audio
+from utils.vad import compress_speech, remap_result
+from utils.whisper_models import DEFAULT_MODEL, get_model, model_spec
+
+# Number of worker processes, each holding its own warm Whisper model, and the
+# maximum number of transcriptions allowed to be running or waiting at once
+POOL_SIZE = int(os.getenv("WHISPER_WORKERS", "2"))
+QUEUE_DEPTH = int(os.getenv("WHISPER_QUEUE_DEPTH", "16"))
+# Intra-op threads per worker, 0 splits the cores evenly between workers
+TORCH_THREADS = int(os.getenv("WHISPER_TORCH_THREADS", "0"))
+
+_executor = None
+_pending = 0
+
+
+class TranscriptionQueueFull(Exception):
+    pass
+
+
+def _init_worker(model_name: str, torch_threads: int):
+    import torch
+
+    # Split the cores between workers instead of letting each one grab all of them
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    get_model(model_name)
+
+
+def _transcribe(audio, model_name: str, options: dict, vad: bool = False) -> dict:
+    model = get_model(model_name)
+    pcm = load_audio(audio)
+    speech, mapping = compress_speech(pcm) if vad else (pcm, None)
+    if mapping is None:
+        result = model.transcribe(pcm, **options)
+    else:
+        result = remap_result(model.transcribe(speech, **options), mapping)
+    # Length of the audio itself, trailing silence included
+    result["duration"] = len(pcm) / SAMPLE_RATE
+    return result
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        torch_threads = TORCH_THREADS or max(1, (os.cpu_count() or 1) // POOL_SIZE)
+        # torch does not survive fork reliably, so workers are spawned
+        _executor = ProcessPoolExecutor(
+            max_workers=POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_spec(DEFAULT_MODEL), torch_threads),
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def submit(fn, *args):
+    global _pending
+    if _pending >= QUEUE_DEPTH:
+        raise TranscriptionQueueFull(f"Transcription queue is full ({QUEUE_DEPTH} pending)")
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def run_transcription(audio, model_name: str = DEFAULT_MODEL, vad: bool = False, **options) -> dict:
+    return await submit(_transcribe, audio, model_name, options, vad)
+
+
+def pending_count() -> int:
+    return _pending
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+
+from utils.audio_decoding import SAMPLE_RATE
+
+# Frames louder than the noise floor (estimated as a low percentile of frame
+# energy) by THRESHOLD_DB count as speech. Silences shorter than
+# MIN_SILENCE_SECONDS are kept, and every speech span is padded on both sides.
+# Audio whose loud frames are not THRESHOLD_DB above its quiet ones has no
+# usable noise floor (e.g. speech without pauses) and is kept whole, as is audio
+# where less than MIN_SPEECH_FRACTION would survive.
+FRAME_SECONDS = 0.03
+THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "15"))
+FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-60"))
+MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "0.6"))
+PADDING_SECONDS = float(os.getenv("VAD_PADDING_SECONDS", "0.2"))
+MIN_SPEECH_FRACTION = float(os.getenv("VAD_MIN_SPEECH_FRACTION", "0.05"))
+
+
+def frame_levels_db(pcm: np.ndarray, frame_length: int) -> np.ndarray:
+    frame_count = -(-len(pcm) // frame_length)
+    frames = np.zeros(frame_count * frame_length, dtype=np.float32)
+    frames[:len(pcm)] = pcm
+    rms = np.sqrt(np.mean(frames.reshape(frame_count, frame_length) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Return an (n, 2) array of [start, end) sample indices of speech spans."""
+    frame_length = int(sample_rate * FRAME_SECONDS)
+    if len(pcm) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    levels = frame_levels_db(pcm, frame_length)
+    floor = max(np.percentile(levels, 10), FLOOR_DB)
+    if np.percentile(levels, 90) - floor <= THRESHOLD_DB:
+        # The quiet frames are not clearly quieter than the loud ones, so they are not silence
+        return np.array([[0, len(pcm)]], dtype=np.int64)
+    speech = levels > floor + THRESHOLD_DB
+
+    # Pad speech frames on both sides
+    padding = int(round(PADDING_SECONDS / FRAME_SECONDS))
+    if padding:
+        speech = np.convolve(speech, np.ones(2 * padding + 1), mode="same") > 0
+
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # Bridge silences that are too short to be worth dropping
+    min_silence = int(round(MIN_SILENCE_SECONDS / FRAME_SECONDS))
+    keep = (starts[1:] - ends[:-1]) >= min_silence
+    starts = np.concatenate(([starts[0]], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], [ends[-1]]))
+
+    spans = np.stack([starts, ends], axis=1) * frame_length
+    return np.minimum(spans, len(pcm))
+
+
+def compress_speech(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """Concatenate the speech spans of pcm.
+
+    Returns the compressed audio and a (compressed_starts, original_starts)
+    mapping, both in seconds, for remap_result. When next to nothing would be
+    kept the detection is not trusted: pcm is returned whole with no mapping.
+    """
+    spans = detect_speech(pcm, sample_rate)
+    lengths = spans[:, 1] - spans[:, 0]
+    if lengths.sum() <= MIN_SPEECH_FRACTION * len(pcm):
+        return pcm, None
+    compressed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / sample_rate
+    original_starts = spans[:, 0] / sample_rate
+    compressed = np.concatenate([pcm[start:end] for start, end in spans])
+    return compressed, (compressed_starts, original_starts)
+
+
+def remap_times(times, mapping, side: str = "right") -> np.ndarray:
+    compressed_starts, original_starts = mapping
+    times = np.asarray(times, dtype=np.float64)
+    # End times that land exactly on a join belong to the span before it
+    index = np.clip(np.searchsorted(compressed_starts, times, side=side) - 1, 0, None)
+    return np.round(original_starts[index] + (times - compressed_starts[index]), 2)
+
+
+def remap_result(result: dict, mapping) -> dict:
+    segments = result['segments']
+    if not segments or len(mapping[0]) == 0:
+        return result
+
+    segment_starts = remap_times([s['start'] for s in segments], mapping)
+    segment_ends = remap_times([s['end'] for s in segments], mapping, side="left")
+    for segment, start, end in zip(segments, segment_starts, segment_ends):
+        segment['start'], segment['end'] = float(start), float(end)
+        words = segment.get('words')
+        if words:
+            word_starts = remap_times([w['start'] for w in words], mapping)
+            word_ends = remap_times([w['end'] for w in words], mapping, side="left")
+            for word, word_start, word_end in zip(words, word_starts, word_ends):
+                word['start'], word['end'] = float(word_start), float(word_end)
+    return result
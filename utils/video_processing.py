@@ -1,17 +1,14 @@
 import os
 import uuid
-import requests
+from utils.download_manager import download_manager
 from moviepy.editor import VideoFileClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip, TextClip, CompositeVideoClip, concatenate_audioclips, ColorClip
 
 def strip_url_params(url: str) -> str:
     return url.split('?')[0]
 
 def download_file(url: str, output_dir: str, prefix: str) -> str:
-    response = requests.get(url)
     file_path = os.path.join(output_dir, f"{prefix}_{uuid.uuid4()}.mp3")
-    with open(file_path, 'wb') as f:
-        f.write(response.content)
-    return file_path
+    return download_manager.download(url, file_path)
 
 def create_video(audio_url: str, asset_urls: list, background_music_url: str, output_video_path: str):
     # Implement the create video logic
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import whisper
+
+AVAILABLE_MODELS = ["tiny", "tiny.en", "base", "base.en", "small", "small.en"]
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "tiny.en")
+
+# Models with this suffix have their linear layers dynamically quantized to
+# int8, e.g. "base.en+int8"
+QUANTIZED_SUFFIX = "+int8"
+QUANTIZED_DEFAULT = os.getenv("WHISPER_QUANTIZED", "0") == "1"
+
+# Total resident size allowed for loaded models, and how long a model may sit
+# unused before it is dropped on the next registry access
+MEMORY_BUDGET_MB = float(os.getenv("WHISPER_MEMORY_BUDGET_MB", "1024"))
+IDLE_SECONDS = float(os.getenv("WHISPER_IDLE_SECONDS", "600"))
+
+# Approximate fp32 weight sizes, used to make room before a model is loaded
+_ESTIMATED_SIZE_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+}
+
+_models = OrderedDict()  # name -> {"model": ..., "size_mb": ..., "last_used": ...}
+_lock = threading.Lock()
+
+
+def validate_model_name(name: str) -> str:
+    base_name = name[:-len(QUANTIZED_SUFFIX)] if name.endswith(QUANTIZED_SUFFIX) else name
+    if base_name not in AVAILABLE_MODELS:
+        raise ValueError(f"Unknown Whisper model '{name}', expected one of {AVAILABLE_MODELS}")
+    return name
+
+
+def model_spec(name: str, quantized: bool = QUANTIZED_DEFAULT) -> str:
+    if quantized and not name.endswith(QUANTIZED_SUFFIX):
+        return name + QUANTIZED_SUFFIX
+    return name
+
+
+def _model_size_mb(model) -> float:
+    size = 0
+    for value in model.state_dict().values():
+        # Quantized linear layers keep their weights as packed param tuples
+        tensors = value if isinstance(value, tuple) else (value,)
+        size += sum(t.numel() * t.element_size() for t in tensors if hasattr(t, "element_size"))
+    return size / (1024 * 1024)
+
+
+def _quantize(model):
+    import torch
+    from whisper.model import Linear as WhisperLinear
+
+    # quantize_dynamic only swaps exact nn.Linear modules, so Whisper's
+    # dtype-casting subclass is replaced by plain layers sharing its weights
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, WhisperLinear):
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(module, child_name, linear)
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _evict(name: str):
+    entry = _models.pop(name)
+    print(f"Evicting Whisper model {name} ({entry['size_mb']:.0f} MB)")
+
+
+def _evict_idle(now: float):
+    for name in [n for n, e in _models.items() if now - e["last_used"] > IDLE_SECONDS]:
+        _evict(name)
+
+
+def _make_room(needed_mb: float):
+    # Least recently used models are at the front of the OrderedDict
+    while _models and loaded_size_mb() + needed_mb > MEMORY_BUDGET_MB:
+        _evict(next(iter(_models)))
+
+
+def loaded_size_mb() -> float:
+    return sum(entry["size_mb"] for entry in _models.values())
+
+
+def loaded_models() -> list:
+    return list(_models.keys())
+
+
+def get_model(name: str = DEFAULT_MODEL):
+    validate_model_name(name)
+    with _lock:
+        now = time.time()
+        _evict_idle(now)
+
+        entry = _models.get(name)
+        if entry is None:
+            quantized = name.endswith(QUANTIZED_SUFFIX)
+            base_name = name[:-len(QUANTIZED_SUFFIX)] if quantized else name
+            _make_room(_ESTIMATED_SIZE_MB[base_name.split(".")[0]])
+            print(f"Loading Whisper model {name}...")
+            model = whisper.load_model(base_name, device="cpu" if quantized else None)
+            if quantized:
+                model = _quantize(model.eval())
+            entry = {"model": model, "size_mb": _model_size_mb(model), "last_used": now}
+            _models[name] = entry
+            print(f"Loaded Whisper model {name} ({entry['size_mb']:.0f} MB, {loaded_size_mb():.0f} MB resident)")
+
+        entry["last_used"] = now
+        _models.move_to_end(name)
+        return entry["model"]